@@ -0,0 +1,285 @@
+import math as python_math  # Using python-math
+
+import numpy as np
+
+from anytime import Budget
+from cooling import SCHEDULES, AdaptiveSchedule, GeometricSchedule
+from seeding import make_rng, scalar_random
+
+# Move types tried by the annealer, each scored from the few edges it changes
+# Deltas assume a symmetric metric: solve_tsp anneals directed (road)
+# matrices on their symmetrized form and re-costs the result
+MOVES = ("swap", "two_opt", "insertion")
+# Move types the batched annealer scores with NumPy, and its batch sizes:
+# batches shrink towards MIN_BATCH while moves are accepted often (hot) and
+# grow to BATCH_SIZE while they are not (cold)
+BATCH_MOVES = ("swap", "two_opt")
+BATCH_SIZE = 1024
+MIN_BATCH = 16
+# Stops from which solve_tsp anneals in batches unless told otherwise. Measured
+# mean route lengths (3 seeds, random stops, 1 s and 3 s limits): unpolished,
+# batched was 1-2% longer at 200 stops but 4-7% shorter from 1000 to 5000;
+# with the default polish the two were within 0.4% up to 2000 stops and
+# batched was 0.3-2.5% shorter at 5000
+BATCH_THRESHOLD = 1000
+
+
+# Function to compute the length of a path tour
+def tour_length(tour, distance):
+    return sum(distance(tour[k - 1], tour[k]) for k in range(1, len(tour)))
+
+
+# Function to score swapping the stops at positions i < j
+def swap_delta(tour, distance, i, j):
+    a, x, b = tour[i - 1], tour[i], tour[i + 1]
+    c, y, e = tour[j - 1], tour[j], tour[j + 1]
+    if j == i + 1:
+        return (distance(a, y) + distance(y, x) + distance(x, e)
+                - distance(a, x) - distance(x, y) - distance(y, e))
+    return (distance(a, y) + distance(y, b) + distance(c, x) + distance(x, e)
+            - distance(a, x) - distance(x, b) - distance(c, y) - distance(y, e))
+
+
+def apply_swap(tour, i, j):
+    tour[i], tour[j] = tour[j], tour[i]
+
+
+# Function to score reversing the segment tour[i..j] (i < j)
+# Assumes a symmetric metric; the reversed inner edges keep their length
+def two_opt_delta(tour, distance, i, j):
+    a, x = tour[i - 1], tour[i]
+    y, e = tour[j], tour[j + 1]
+    return distance(a, y) + distance(x, e) - distance(a, x) - distance(y, e)
+
+
+def apply_two_opt(tour, i, j):
+    tour[i:j + 1] = reversed(tour[i:j + 1])
+
+
+# Function to score moving the stop at position i so it ends up at position j
+def insertion_delta(tour, distance, i, j):
+    a, x, b = tour[i - 1], tour[i], tour[i + 1]
+    removed = distance(a, b) - distance(a, x) - distance(x, b)
+    if j > i:
+        p, q = tour[j], tour[j + 1]
+    else:
+        p, q = tour[j - 1], tour[j]
+    return removed + distance(p, x) + distance(x, q) - distance(p, q)
+
+
+def apply_insertion(tour, i, j):
+    tour.insert(j, tour.pop(i))
+
+
+MOVE_FUNCTIONS = {
+    "swap": (swap_delta, apply_swap),
+    "two_opt": (two_opt_delta, apply_two_opt),
+    "insertion": (insertion_delta, apply_insertion),
+}
+
+
+# Function to score a batch of swaps of positions i < j (index arrays)
+# d is a vectorized lookup d(rows, cols), see distance_matrix.batch_distance_function
+def swap_deltas(tour, d, i, j):
+    a, x, b = tour[i - 1], tour[i], tour[i + 1]
+    c, y, e = tour[j - 1], tour[j], tour[j + 1]
+    adjacent = d(a, y) + d(y, x) + d(x, e) - d(a, x) - d(x, y) - d(y, e)
+    apart = (d(a, y) + d(y, b) + d(c, x) + d(x, e)
+             - d(a, x) - d(x, b) - d(c, y) - d(y, e))
+    return np.where(j == i + 1, adjacent, apart)
+
+
+# Function to score a batch of reversals of tour[i..j] (i < j index arrays)
+def two_opt_deltas(tour, d, i, j):
+    a, x = tour[i - 1], tour[i]
+    y, e = tour[j], tour[j + 1]
+    return d(a, y) + d(x, e) - d(a, x) - d(y, e)
+
+
+BATCH_DELTA_FUNCTIONS = {
+    "swap": swap_deltas,
+    "two_opt": two_opt_deltas,
+}
+
+
+# Function to sample the deltas of random moves on a tour
+def sample_move_deltas(tour, distance, samples=200, moves=MOVES, rng=None):
+    if len(tour) < 4:
+        return []
+    random = scalar_random(make_rng(rng))
+    interior = range(1, len(tour) - 1)
+    move_functions = [MOVE_FUNCTIONS[move] for move in moves]
+    deltas = []
+    for _ in range(samples):
+        delta_function, apply_function = random.choice(move_functions)
+        i, j = random.sample(interior, 2)
+        if apply_function is not apply_insertion and i > j:
+            i, j = j, i
+        deltas.append(delta_function(tour, distance, i, j))
+    return deltas
+
+
+# Function to run one Metropolis chain over a path tour with fixed ends
+# schedule (see cooling.py) supplies the temperature and is told after every
+# move whether it was accepted; the chain's final tour is returned along with
+# the best one so parallel tempering can continue it
+# rng (a seed or numpy Generator) makes the chain reproducible
+def annealing_chain(tour, distance, budget, schedule, moves=MOVES, rng=None):
+    tour = list(tour)
+    best_tour = tour[:]
+    current_distance = tour_length(tour, distance)
+    best_distance = current_distance
+    if len(tour) < 4:
+        budget.stop_reason = "trivial"
+        return tour, current_distance, best_tour, best_distance
+
+    random = scalar_random(make_rng(rng))
+    interior = range(1, len(tour) - 1)
+    move_functions = [MOVE_FUNCTIONS[move] for move in moves]
+
+    while not budget.exhausted(best_distance):
+        temp = schedule.temperature
+        delta_function, apply_function = random.choice(move_functions)
+        i, j = random.sample(interior, 2)
+        if apply_function is not apply_insertion and i > j:
+            i, j = j, i
+
+        delta = delta_function(tour, distance, i, j)
+        accepted = delta < 0 or (temp > 0 and random.random() < python_math.exp(-delta / temp))
+        improved = False
+        if accepted:
+            apply_function(tour, i, j)
+            current_distance += delta
+
+            if current_distance < best_distance - 1e-12:
+                best_tour = tour[:]
+                best_distance = current_distance
+                improved = True
+        budget.record(improved)
+        schedule.step(accepted, improved)
+
+    # Recompute exactly so floating-point drift never leaks into the result
+    return tour, tour_length(tour, distance), best_tour, tour_length(best_tour, distance)
+
+
+# Function to run one Metropolis chain that scores moves in NumPy batches
+# Each batch draws random (i, j) swap and 2-opt candidates on the tour array
+# and computes all their deltas with fancy indexing through batch_distance.
+# selection="best" Metropolis-tests only the batch's best candidate, so every
+# batch counts as one iteration of the budget while the schedule sees all
+# batch_size candidates and how many passed; selection="metropolis" applies
+# the first candidate that passes the Metropolis test, which is the same chain as
+# trying them one by one (rejected moves leave the tour unchanged) and only
+# pays off once few moves are accepted. Returns the same tuple as annealing_chain
+def batched_annealing_chain(tour, batch_distance, budget, schedule, moves=BATCH_MOVES,
+                            batch_size=BATCH_SIZE, selection="best", rng=None):
+    def d(rows, cols):
+        return np.asarray(batch_distance(rows, cols), dtype=np.float64)
+
+    def length(path):
+        return float(d(path[:-1], path[1:]).sum())
+
+    tour = np.array(tour, dtype=np.int64)
+    best_tour = tour.copy()
+    current_distance = best_distance = length(tour)
+    n = len(tour)
+    if n < 4:
+        budget.stop_reason = "trivial"
+        return tour.tolist(), current_distance, best_tour.tolist(), best_distance
+
+    rng = make_rng(rng)
+    delta_functions = [BATCH_DELTA_FUNCTIONS[move] for move in moves]
+    size = batch_size if selection == "best" else MIN_BATCH
+
+    while not budget.exhausted(best_distance):
+        if selection != "best" and budget.max_iterations is not None:
+            size = min(size, budget.max_iterations - budget.iterations)
+        temp = schedule.temperature
+        i = rng.integers(1, n - 1, size)
+        j = rng.integers(1, n - 2, size)
+        j += j >= i
+        i, j = np.minimum(i, j), np.maximum(i, j)
+        kinds = rng.integers(len(delta_functions), size=size)
+        deltas = np.empty(size)
+        for kind, delta_function in enumerate(delta_functions):
+            chosen = kinds == kind
+            deltas[chosen] = delta_function(tour, d, i[chosen], j[chosen])
+
+        if temp > 0:
+            passed = rng.random(size) < np.exp(-np.maximum(deltas, 0) / temp)
+        else:
+            passed = deltas < 0
+        if selection == "best":
+            k = int(np.argmin(deltas))
+            accepted = bool(passed[k])
+            count, passes = size, int(passed.sum())
+        else:
+            k = int(np.argmax(passed))
+            accepted = bool(passed[k])
+            count = k + 1 if accepted else size
+            passes = int(accepted)
+
+        improved = False
+        if accepted:
+            a, b = i[k], j[k]
+            if moves[kinds[k]] == "swap":
+                tour[a], tour[b] = tour[b], tour[a]
+            else:
+                tour[a:b + 1] = tour[a:b + 1][::-1].copy()
+            current_distance += deltas[k]
+            if current_distance < best_distance - 1e-12:
+                best_tour = tour.copy()
+                best_distance = current_distance
+                improved = True
+        budget.record(improved, 1 if selection == "best" else count)
+        schedule.step(passes, improved, count)
+
+        if selection != "best":
+            size = max(MIN_BATCH, min(batch_size, 2 * count)) if accepted else min(batch_size, 2 * size)
+
+    # Recompute exactly so floating-point drift never leaks into the result
+    return tour.tolist(), length(tour), best_tour.tolist(), length(best_tour)
+
+
+# Simulated annealing over a path tour with fixed first and last stops
+# Each iteration scores one random move in O(1) and applies it in place when
+# accepted; only improvements of the best tour are copied
+# budget (an anytime.Budget) replaces the fixed iteration count when given
+# schedule="geometric" cools by cooling_rate after every move from temperature;
+# schedule="adaptive" calibrates its own temperatures (see cooling.py)
+# batch_distance (a vectorized lookup) switches to batched_annealing_chain,
+# which scores swap and 2-opt moves batch_size at a time
+# rng (a seed or numpy Generator) makes the run reproducible
+def anneal(tour, distance, iterations=1000, temperature=10000, cooling_rate=0.95,
+           moves=MOVES, budget=None, schedule="geometric", batch_distance=None,
+           batch_size=BATCH_SIZE, selection="best", rng=None):
+    budget = budget or Budget(max_iterations=iterations)
+    rng = make_rng(rng)
+    if batch_distance is not None:
+        moves = tuple(move for move in moves if move in BATCH_DELTA_FUNCTIONS) or BATCH_MOVES
+        schedule = make_schedule(schedule, tour, distance, budget, temperature, cooling_rate, moves,
+                                 rng)
+        _, _, best_tour, best_distance = batched_annealing_chain(tour, batch_distance, budget,
+                                                                 schedule, moves, batch_size,
+                                                                 selection, rng)
+    else:
+        schedule = make_schedule(schedule, tour, distance, budget, temperature, cooling_rate, moves,
+                                 rng)
+        _, _, best_tour, best_distance = annealing_chain(tour, distance, budget, schedule, moves,
+                                                         rng)
+    return best_tour, best_distance
+
+
+# Function to build a cooling schedule by name for a run on `tour`; a
+# schedule object is passed through unchanged
+def make_schedule(schedule, tour, distance, budget, temperature=10000, cooling_rate=0.95,
+                  moves=MOVES, rng=None):
+    if isinstance(schedule, str) and schedule not in SCHEDULES:
+        raise ValueError(f"Unknown cooling schedule: {schedule!r} (expected one of {SCHEDULES})")
+    if schedule == "geometric":
+        return GeometricSchedule(temperature, cooling_rate)
+    if schedule == "adaptive":
+        deltas = sample_move_deltas(tour, distance, moves=moves, rng=rng)
+        mean_edge = tour_length(tour, distance) / max(len(tour) - 1, 1)
+        return AdaptiveSchedule.calibrate(deltas, len(tour), budget, mean_edge=mean_edge)
+    return schedule
@@ -0,0 +1,60 @@
+import time
+
+
+# Stopping rule and progress counters shared by the anytime solvers
+# A run stops at the first of: max_iterations, time_limit seconds, patience
+# iterations without improving the best tour, or reaching target distance
+class Budget:
+    def __init__(self, time_limit=None, max_iterations=None, patience=None, target=None):
+        self.time_limit = time_limit
+        self.max_iterations = max_iterations
+        self.patience = patience
+        self.target = target
+        self.started = time.perf_counter()
+        self.iterations = 0
+        self.improvements = 0
+        self.since_improvement = 0
+        self.stop_reason = None
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    # Function to count one iteration (or a batch of count iterations);
+    # improved marks a new best tour found by the last of them
+    def record(self, improved=False, count=1):
+        self.iterations += count
+        if improved:
+            self.improvements += 1
+            self.since_improvement = 0
+        else:
+            self.since_improvement += count
+
+    # Function to check whether the solver should stop and remember why
+    def exhausted(self, best_distance=None):
+        if self.max_iterations is not None and self.iterations >= self.max_iterations:
+            self.stop_reason = "iterations"
+        elif self.time_limit is not None and self.elapsed >= self.time_limit:
+            self.stop_reason = "time_limit"
+        elif self.patience is not None and self.since_improvement >= self.patience:
+            self.stop_reason = "patience"
+        elif (self.target is not None and best_distance is not None
+              and best_distance <= self.target):
+            self.stop_reason = "target"
+        return self.stop_reason is not None
+
+    # Function to check the time limit alone, for work that must finish a run
+    # (a first descent, a final polish) whatever the iteration count says
+    def out_of_time(self):
+        if self.time_limit is not None and self.elapsed >= self.time_limit:
+            self.stop_reason = "time_limit"
+            return True
+        return False
+
+    def stats(self):
+        return {
+            'iterations': self.iterations,
+            'improvements': self.improvements,
+            'elapsed': self.elapsed,
+            'stop_reason': self.stop_reason,
+        }
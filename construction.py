@@ -0,0 +1,285 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components, minimum_spanning_tree
+from scipy.spatial import cKDTree
+
+from distance_matrix import distance_function
+from seeding import make_rng
+from sparse_graph import to_unit_sphere
+
+# Nearest neighbours considered per stop by greedy edge and the spanning tree
+CONSTRUCTION_NEIGHBORS = 10
+HILBERT_ORDER = 16
+
+CONSTRUCTIONS = ("random", "nearest_neighbor", "greedy", "space_filling_curve", "christofides")
+
+
+# Function to return a random tour with fixed first and last stops
+# rng is a seed or numpy Generator
+def random_tour(n, rng=None):
+    if n <= 1:
+        return list(range(n))
+    interior = make_rng(rng).permutation(np.arange(1, n - 1)).tolist()
+    return [0] + interior + [n - 1]
+
+
+# Function to find the nearest point to `query` that is not yet used
+# Asks the KD-tree for more neighbours until an unused one turns up
+def _nearest_unused(tree, query, used, remaining):
+    k = 8
+    while True:
+        k = min(k, tree.n)
+        _, indices = tree.query(query, k=k)
+        for index in np.atleast_1d(indices):
+            if index < tree.n and not used[index]:
+                return int(index)
+        if k == tree.n:
+            return None
+        if k > 4 * remaining:
+            # Few stops left: a direct scan is cheaper than a bigger query
+            candidates = np.flatnonzero(~used)
+            offsets = tree.data[candidates] - query
+            return int(candidates[np.argmin(np.einsum("ij,ij->i", offsets, offsets))])
+        k *= 2
+
+
+# Function to build a nearest-neighbour tour from the first to the last stop
+def nearest_neighbor_tour(locations, distance_matrix=None):
+    n = len(locations)
+    if n <= 3:
+        return list(range(n))
+    xyz = to_unit_sphere(locations)
+    tree = cKDTree(xyz)
+    used = np.zeros(n, dtype=bool)
+    used[0] = used[n - 1] = True
+    tour = [0]
+    for remaining in range(n - 2, 0, -1):
+        nxt = _nearest_unused(tree, xyz[tour[-1]], used, remaining)
+        used[nxt] = True
+        tour.append(nxt)
+    return tour + [n - 1]
+
+
+# Function to list each stop's nearest-neighbour edges, shortest first
+# Returns (weights, i, j) arrays with i < j; a sparse graph's own neighbour
+# lists are used as is, otherwise neighbours come from a KD-tree
+def _candidate_edges(locations, distance_matrix, k=CONSTRUCTION_NEIGHBORS):
+    n = len(locations)
+    if hasattr(distance_matrix, "indptr"):
+        rows = np.repeat(np.arange(n), np.diff(distance_matrix.indptr))
+        cols = distance_matrix.indices.astype(np.int64)
+        weights = distance_matrix.data.astype(np.float64)
+    else:
+        k = min(k, n - 1)
+        xyz = to_unit_sphere(locations)
+        _, neighbors = cKDTree(xyz).query(xyz, k=k + 1)
+        rows = np.repeat(np.arange(n), k + 1)
+        cols = neighbors.ravel().astype(np.int64)
+        if isinstance(distance_matrix, np.ndarray):
+            weights = np.asarray(distance_matrix[rows, cols], dtype=np.float64)
+        else:
+            distance = distance_function(distance_matrix)
+            weights = np.array([distance(i, j) for i, j in zip(rows, cols)], dtype=np.float64)
+
+    keep = rows != cols
+    rows, cols, weights = rows[keep], cols[keep], weights[keep]
+    lo, hi = np.minimum(rows, cols), np.maximum(rows, cols)
+    _, unique = np.unique(lo * n + hi, return_index=True)
+    lo, hi, weights = lo[unique], hi[unique], weights[unique]
+    order = np.argsort(weights, kind="stable")
+    return weights[order], lo[order], hi[order]
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+# Function to build a greedy-edge tour: take the shortest candidate edges that
+# keep every degree <= 2 (<= 1 at the fixed ends) without closing a cycle or
+# joining the two ends early, then chain the fragments by nearest endpoints
+def greedy_tour(locations, distance_matrix):
+    n = len(locations)
+    if n <= 3:
+        return list(range(n))
+    start, end = 0, n - 1
+    degree = [0] * n
+    capacity = [2] * n
+    capacity[start] = capacity[end] = 1
+    adjacency = [[] for _ in range(n)]
+    parent = list(range(n))
+
+    for _, i, j in zip(*_candidate_edges(locations, distance_matrix)):
+        i, j = int(i), int(j)
+        if degree[i] >= capacity[i] or degree[j] >= capacity[j]:
+            continue
+        root_i, root_j = _find(parent, i), _find(parent, j)
+        if root_i == root_j:
+            continue
+        ends = {_find(parent, start), _find(parent, end)}
+        if root_i in ends and root_j in ends:
+            continue
+        parent[root_i] = root_j
+        degree[i] += 1
+        degree[j] += 1
+        adjacency[i].append(j)
+        adjacency[j].append(i)
+
+    # Split the chosen edges into path fragments, each listed from one endpoint
+    fragments, fragment_of = [], {}
+    walked = [False] * n
+    for i in range(n):
+        if degree[i] < 2 and not walked[i]:
+            fragment, previous, node = [], None, i
+            while node is not None:
+                fragment.append(node)
+                walked[node] = True
+                following = [m for m in adjacency[node] if m != previous]
+                previous, node = node, following[0] if following else None
+            for endpoint in (fragment[0], fragment[-1]):
+                fragment_of[endpoint] = len(fragments)
+            fragments.append(fragment)
+
+    # Chain fragments from the start's, always jumping to the nearest free
+    # endpoint of an unused fragment; the end's fragment goes last
+    endpoints = np.array(sorted(fragment_of))
+    tree = cKDTree(to_unit_sphere(np.asarray(locations, dtype=np.float64)[endpoints]))
+    blocked = np.zeros(len(endpoints), dtype=bool)
+    position = {node: k for k, node in enumerate(endpoints)}
+
+    def take(fragment_id):
+        fragment = fragments[fragment_id]
+        blocked[position[fragment[0]]] = blocked[position[fragment[-1]]] = True
+        return fragment
+
+    first = take(fragment_of[start])
+    tour = first if first[0] == start else first[::-1]
+    last = take(fragment_of[end])
+    last = last if last[-1] == end else last[::-1]
+    xyz = to_unit_sphere(locations)
+    remaining = int((~blocked).sum())
+    while remaining:
+        nearest = _nearest_unused(tree, xyz[tour[-1]], blocked, remaining)
+        node = int(endpoints[nearest])
+        fragment = take(fragment_of[node])
+        tour += fragment if fragment[0] == node else fragment[::-1]
+        remaining = int((~blocked).sum())
+    return tour + last
+
+
+# Function to compute Hilbert curve indices for points on a 2^order grid
+def hilbert_index(x, y, order=HILBERT_ORDER):
+    x = x.astype(np.int64)
+    y = y.astype(np.int64)
+    index = np.zeros_like(x)
+    s = 1 << (order - 1)
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        index += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve stays continuous
+        flip = ~ry
+        swap_x = np.where(flip & rx, s - 1 - x, x)
+        swap_y = np.where(flip & rx, s - 1 - y, y)
+        x, y = np.where(flip, swap_y, swap_x), np.where(flip, swap_x, swap_y)
+        s >>= 1
+    return index
+
+
+# Function to order the interior stops along a Hilbert space-filling curve
+def space_filling_curve_tour(locations, distance_matrix):
+    n = len(locations)
+    if n <= 3:
+        return list(range(n))
+    distance = distance_function(distance_matrix)
+    points = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+    lo, hi = points.min(axis=0), points.max(axis=0)
+    scale = ((1 << HILBERT_ORDER) - 1) / np.maximum(hi - lo, 1e-12)
+    grid = ((points - lo) * scale).astype(np.int64)
+    order = np.argsort(hilbert_index(grid[:, 1], grid[:, 0]), kind="stable")
+    interior = [int(i) for i in order if 0 < i < n - 1]
+    # Run the curve in whichever direction joins the fixed ends more cheaply
+    if (distance(0, interior[-1]) + distance(interior[0], n - 1)
+            < distance(0, interior[0]) + distance(interior[-1], n - 1)):
+        interior.reverse()
+    return [0] + interior + [n - 1]
+
+
+# Function to build a Christofides-lite tour: a minimum spanning tree over the
+# nearest-neighbour graph, walked depth first from the start (shortcutting
+# repeated stops) and visiting the branch that holds the end stop last
+def christofides_tour(locations, distance_matrix):
+    n = len(locations)
+    if n <= 3:
+        return list(range(n))
+    distance = distance_function(distance_matrix)
+    weights, rows, cols = _candidate_edges(locations, distance_matrix)
+    # Zero-length edges would vanish from the sparse graph
+    weights = np.maximum(weights, 1e-12).tolist()
+    rows, cols = rows.tolist(), cols.tolist()
+
+    # Join components of a disconnected neighbour graph along the curve order
+    count, labels = connected_components(coo_matrix((weights, (rows, cols)), shape=(n, n)),
+                                         directed=False)
+    if count > 1:
+        representatives = {}
+        for i in space_filling_curve_tour(locations, distance_matrix):
+            representatives.setdefault(labels[i], i)
+        chain = list(representatives.values())
+        for a, b in zip(chain, chain[1:]):
+            rows.append(a)
+            cols.append(b)
+            weights.append(max(distance(a, b), 1e-12))
+
+    tree = minimum_spanning_tree(coo_matrix((weights, (rows, cols)), shape=(n, n))).tocoo()
+    adjacency = [[] for _ in range(n)]
+    for i, j in zip(tree.row, tree.col):
+        adjacency[i].append(int(j))
+        adjacency[j].append(int(i))
+
+    # Mark the stops on the tree path from the start to the end
+    parent = [-1] * n
+    stack, seen = [0], [False] * n
+    seen[0] = True
+    while stack:
+        node = stack.pop()
+        for child in adjacency[node]:
+            if not seen[child]:
+                seen[child] = True
+                parent[child] = node
+                stack.append(child)
+    on_end_path = [False] * n
+    node = n - 1
+    while node != -1:
+        on_end_path[node] = True
+        node = parent[node]
+
+    tour = []
+    stack = [0]
+    while stack:
+        node = stack.pop()
+        if node != n - 1:
+            tour.append(node)
+        children = [c for c in adjacency[node] if parent[c] == node]
+        # Nearest child first; the branch towards the end is pushed first so it pops last
+        children.sort(key=lambda c: (not on_end_path[c], -distance(node, c)))
+        stack.extend(children)
+    return tour + [n - 1]
+
+
+# Function to build a starting tour with the named construction heuristic
+# rng (a seed or numpy Generator) is only used by "random"
+def construct_tour(method, locations, distance_matrix, rng=None):
+    if method == "random":
+        return random_tour(len(locations), rng)
+    if method == "nearest_neighbor":
+        return nearest_neighbor_tour(locations, distance_matrix)
+    if method == "greedy":
+        return greedy_tour(locations, distance_matrix)
+    if method == "space_filling_curve":
+        return space_filling_curve_tour(locations, distance_matrix)
+    if method == "christofides":
+        return christofides_tour(locations, distance_matrix)
+    raise ValueError(f"Unknown construction heuristic: {method!r} (expected one of {CONSTRUCTIONS})")
@@ -0,0 +1,164 @@
+import math as python_math  # Using python-math
+
+SCHEDULES = ("adaptive", "geometric")
+
+# Share of sampled uphill moves accepted at the start of an adaptive run
+INITIAL_ACCEPTANCE = 0.3
+# The initial temperature never exceeds this fraction of the starting tour's
+# mean edge length: random moves on a good constructed tour are mostly far
+# uphill, so calibrating on them alone scrambles the tour it should improve
+START_EDGE_FRACTION = 0.1
+# Final temperature as a fraction of the calibrated initial one
+FINAL_TEMPERATURE_RATIO = 1e-3
+# Cooling per epoch when the run has no iteration or time budget to pace against
+EPOCH_COOLING_RATE = 0.95
+# Epochs without a new best tour, with acceptance below FROZEN_ACCEPTANCE,
+# before the schedule reheats by REHEAT_FACTOR (never above the initial
+# temperature). Paced runs wait at least REHEAT_PATIENCE_SHARE of the budget
+# and stop reheating after REHEAT_CUTOFF of it, leaving the rest to cool
+REHEAT_PATIENCE = 10
+REHEAT_PATIENCE_SHARE = 0.05
+REHEAT_CUTOFF = 0.5
+FROZEN_ACCEPTANCE = 0.02
+REHEAT_FACTOR = 10
+
+
+# Legacy schedule: temperature multiplied by cooling_rate after every move
+class GeometricSchedule:
+    def __init__(self, temperature, cooling_rate):
+        self.temperature = temperature
+        self.cooling_rate = cooling_rate
+
+    def step(self, accepted, improved, count=1):
+        self.temperature *= self.cooling_rate ** count
+
+
+# Constant temperature, used by parallel-tempering replicas
+class FixedSchedule:
+    def __init__(self, temperature):
+        self.temperature = temperature
+
+    def step(self, accepted, improved, count=1):
+        pass
+
+
+# Adaptive schedule: initial temperature calibrated from sampled move deltas,
+# cooling once per epoch (not per move) paced to the run's iteration or time
+# budget, and reheating when the chain freezes without finding a better tour
+# early in the run. Each epoch's temperature and acceptance rate are kept in
+# history for telemetry
+class AdaptiveSchedule:
+    def __init__(self, initial_temperature, epoch_length, budget=None,
+                 final_ratio=FINAL_TEMPERATURE_RATIO):
+        self.initial_temperature = initial_temperature
+        self.final_temperature = initial_temperature * final_ratio
+        self.temperature = initial_temperature
+        self.epoch_length = epoch_length
+        self.budget = budget
+        self.reheat_temperature = 0.0
+        self.reheats = 0
+        self.history = []
+        self._steps = self._accepted = self._improved = 0
+        self._stagnant_epochs = 0
+        self._stagnant_since = None
+        self._epoch_temperature = initial_temperature
+
+    # Function to calibrate the initial temperature so that sampled uphill
+    # moves would be accepted with average probability initial_acceptance,
+    # capped at START_EDGE_FRACTION of mean_edge (the starting tour's mean
+    # edge length) when given
+    @classmethod
+    def calibrate(cls, deltas, n, budget=None, initial_acceptance=INITIAL_ACCEPTANCE,
+                  mean_edge=None):
+        uphill = [delta for delta in deltas if delta > 0]
+        if not uphill:
+            initial_temperature = 1.0
+        else:
+            # Bisect on log(T); the mean acceptance grows monotonically with T
+            low, high = python_math.log(min(uphill)) - 10, python_math.log(max(uphill)) + 10
+            for _ in range(60):
+                middle = (low + high) / 2
+                temperature = python_math.exp(middle)
+                accepted = sum(python_math.exp(-delta / temperature) for delta in uphill)
+                if accepted / len(uphill) < initial_acceptance:
+                    low = middle
+                else:
+                    high = middle
+            initial_temperature = python_math.exp(high)
+        if mean_edge:
+            initial_temperature = min(initial_temperature, START_EDGE_FRACTION * mean_edge)
+        return cls(initial_temperature, epoch_length=min(max(n, 100), 10000), budget=budget)
+
+    # Function to return the share of the run completed, or None when unpaced
+    def _progress(self):
+        budget = self.budget
+        if budget is None:
+            return None
+        if budget.max_iterations:
+            return min(1.0, budget.iterations / budget.max_iterations)
+        if budget.time_limit:
+            return min(1.0, budget.elapsed / budget.time_limit)
+        return None
+
+    # Function to record count moves; accepted and improved say how many of
+    # them were accepted and improved the best tour
+    def step(self, accepted, improved, count=1):
+        self._steps += count
+        self._accepted += accepted
+        self._improved += improved
+        if self._steps >= self.epoch_length:
+            self._end_epoch()
+
+    def _end_epoch(self):
+        acceptance_rate = self._accepted / self._steps
+        self.history.append({
+            'temperature': self.temperature,
+            'acceptance_rate': acceptance_rate,
+            'improvements': self._improved,
+        })
+        frozen = not self._improved and acceptance_rate < FROZEN_ACCEPTANCE
+        self._steps = self._accepted = self._improved = 0
+
+        progress = self._progress()
+        if progress is None:
+            self._epoch_temperature *= EPOCH_COOLING_RATE
+        else:
+            ratio = self.final_temperature / self.initial_temperature
+            self._epoch_temperature = self.initial_temperature * ratio ** progress
+
+        self.reheat_temperature *= EPOCH_COOLING_RATE
+        if self._should_reheat(frozen, progress):
+            self.reheat_temperature = min(self.initial_temperature,
+                                          self.temperature * REHEAT_FACTOR)
+            self.reheats += 1
+        self.temperature = max(self._epoch_temperature, self.reheat_temperature)
+
+    # Function to track frozen epochs and decide whether to reheat now
+    def _should_reheat(self, frozen, progress):
+        if not frozen:
+            self._stagnant_epochs, self._stagnant_since = 0, None
+            return False
+        self._stagnant_epochs += 1
+        if self._stagnant_since is None:
+            self._stagnant_since = progress
+        if self._stagnant_epochs < REHEAT_PATIENCE:
+            return False
+        if progress is not None and (progress >= REHEAT_CUTOFF
+                                     or progress - self._stagnant_since < REHEAT_PATIENCE_SHARE):
+            return False
+        self._stagnant_epochs, self._stagnant_since = 0, None
+        return True
+
+    @property
+    def acceptance_rate(self):
+        return self.history[-1]['acceptance_rate'] if self.history else None
+
+    def telemetry(self):
+        return {
+            'initial_temperature': self.initial_temperature,
+            'final_temperature': self.temperature,
+            'epochs': len(self.history),
+            'reheats': self.reheats,
+            'acceptance_rate': self.acceptance_rate,
+            'history': self.history,
+        }
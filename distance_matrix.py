@@ -0,0 +1,448 @@
+import math
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from geopy.distance import geodesic
+
+# Mean earth radius (km) and WGS-84 ellipsoid, same constants geopy uses
+EARTH_RADIUS_KM = 6371.0088
+WGS84_A = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+
+# Supported metrics: "haversine" is the fast spherical approximation (within
+# ~0.6% of geopy), "geodesic" is vectorized Vincenty on WGS-84 (within 1 mm of
+# geopy.distance.geodesic; the rare non-converging near-antipodal pairs fall
+# back to geopy itself)
+METRICS = ("haversine", "geodesic")
+
+# Above this many locations the matrix is built in row tiles across processes
+BLOCKED_MATRIX_THRESHOLD = 2000
+# Cells per tile; bounds each worker's float64 temporaries to a few tens of MB
+TILE_CELLS = 1_000_000
+
+# Locations shared with tile workers, set once per worker by the pool initializer
+_worker_points = None
+
+
+# Function to convert a list of (lat, lon) pairs into an (n, 2) radians array
+def to_radians(points):
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return np.radians(points)
+
+
+# Function to split two point sets into broadcastable lat/lon radians arrays
+# paired=False pairs every point of a with every point of b, paired=True
+# pairs a[k] with b[k] only
+def _split_coordinates(points_a, points_b, paired):
+    a = to_radians(points_a)
+    b = to_radians(points_b)
+    if paired:
+        return a[:, 0], a[:, 1], b[:, 0], b[:, 1]
+    return a[:, 0:1], a[:, 1:2], b[:, 0], b[:, 1]
+
+
+# Function to compute great-circle distances (km) between two point sets
+def haversine_distances(points_a, points_b, paired=False):
+    lat1, lon1, lat2, lon2 = _split_coordinates(points_a, points_b, paired)
+
+    h = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+# Function to compute ellipsoidal distances (km) between two point sets
+def vincenty_distances(points_a, points_b, paired=False, max_iterations=200, tolerance=1e-12):
+    lat1, lon1, lat2, lon2 = _split_coordinates(points_a, points_b, paired)
+
+    L = np.broadcast_to(lon2 - lon1, np.broadcast_shapes(lat1.shape, lat2.shape))
+    U1 = np.arctan((1 - WGS84_F) * np.tan(lat1))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(lat2))
+    sin_u1, cos_u1 = np.sin(U1), np.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(max_iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam,
+                                 cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0,
+                                 cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos_sq_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = np.where(cos_sq_alpha == 0, 0.0,
+                                    cos_sigma - 2 * sin_u1 * sin_u2 / cos_sq_alpha)
+            C = WGS84_F / 16 * cos_sq_alpha * (4 + WGS84_F * (4 - 3 * cos_sq_alpha))
+            lam_prev = lam
+            lam = L + (1 - C) * WGS84_F * sin_alpha * (
+                sigma + C * sin_sigma * (
+                    cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+            converged = np.abs(lam - lam_prev) < tolerance
+            if converged.all():
+                break
+
+        u_sq = cos_sq_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = B * sin_sigma * (
+            cos_2sigma_m + B / 4 * (
+                cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+                - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2)
+                * (-3 + 4 * cos_2sigma_m ** 2)))
+        distances = WGS84_B * A * (sigma - delta_sigma)
+
+    distances = np.where(sin_sigma == 0, 0.0, distances)
+
+    # Vincenty does not converge for some nearly antipodal pairs
+    failed = ~converged | ~np.isfinite(distances)
+    if failed.any():
+        lat1, lon1, lat2, lon2 = np.broadcast_arrays(
+            *(np.degrees(x) for x in (lat1, lon1, lat2, lon2)))
+        for idx in zip(*np.nonzero(failed)):
+            distances[idx] = geodesic((float(lat1[idx]), float(lon1[idx])),
+                                      (float(lat2[idx]), float(lon2[idx]))).kilometers
+    return distances
+
+
+# Function to compute one great-circle distance (km) with scalar math
+# Single pairs (sparse-graph fallbacks) skip the NumPy overhead of a 1x1 array
+def haversine_distance(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(max(h, 0.0), 1.0)))
+
+
+# Function to compute one ellipsoidal distance (km) with scalar Vincenty, the
+# same iteration as vincenty_distances (geopy for non-converging pairs)
+def vincenty_distance(a, b, max_iterations=200, tolerance=1e-12):
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    L = lon2 - lon1
+    U1 = math.atan((1 - WGS84_F) * math.tan(lat1))
+    U2 = math.atan((1 - WGS84_F) * math.tan(lat2))
+    sin_u1, cos_u1 = math.sin(U1), math.cos(U1)
+    sin_u2, cos_u2 = math.sin(U2), math.cos(U2)
+
+    lam = L
+    for _ in range(max_iterations):
+        sin_lam, cos_lam = math.sin(lam), math.cos(lam)
+        sin_sigma = math.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+        if sin_sigma == 0:
+            return 0.0
+        cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+        sigma = math.atan2(sin_sigma, cos_sigma)
+        sin_alpha = cos_u1 * cos_u2 * sin_lam / sin_sigma
+        cos_sq_alpha = 1 - sin_alpha ** 2
+        cos_2sigma_m = cos_sigma - 2 * sin_u1 * sin_u2 / cos_sq_alpha if cos_sq_alpha else 0.0
+        C = WGS84_F / 16 * cos_sq_alpha * (4 + WGS84_F * (4 - 3 * cos_sq_alpha))
+        lam_prev = lam
+        lam = L + (1 - C) * WGS84_F * sin_alpha * (
+            sigma + C * sin_sigma * (
+                cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+        if abs(lam - lam_prev) < tolerance:
+            break
+    else:
+        return geodesic(tuple(a), tuple(b)).kilometers
+
+    u_sq = cos_sq_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = B * sin_sigma * (
+        cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+    return WGS84_B * A * (sigma - delta_sigma)
+
+
+# Function to compute the distance (km) between two single points
+def point_distance(a, b, metric="geodesic"):
+    if metric == "haversine":
+        return haversine_distance(a, b)
+    if metric == "geodesic":
+        return vincenty_distance(a, b)
+    raise ValueError(f"Unknown distance metric: {metric!r} (expected one of {METRICS})")
+
+
+# Function to compute distances (km) between every point of two sets
+def pairwise_distances(points_a, points_b, metric="geodesic"):
+    if metric == "haversine":
+        return haversine_distances(points_a, points_b)
+    if metric == "geodesic":
+        return vincenty_distances(points_a, points_b)
+    raise ValueError(f"Unknown distance metric: {metric!r} (expected one of {METRICS})")
+
+
+# Function to compute distances (km) between matching points of two equal-length sets
+def paired_distances(points_a, points_b, metric="geodesic"):
+    if metric == "haversine":
+        return haversine_distances(points_a, points_b, paired=True)
+    if metric == "geodesic":
+        return vincenty_distances(points_a, points_b, paired=True)
+    raise ValueError(f"Unknown distance metric: {metric!r} (expected one of {METRICS})")
+
+
+# Function to initialize a tile worker with the point set
+def _init_tile_worker(points):
+    global _worker_points
+    _worker_points = points
+
+
+# Function to fill one row tile (and its mirrored column tile) of the output file
+def _fill_tile(path, start, stop, metric):
+    out = np.load(path, mmap_mode="r+")
+    block = pairwise_distances(_worker_points[start:stop], _worker_points[start:], metric)
+    block = block.astype(out.dtype)
+    out[start:stop, start:] = block
+    out[start:, start:stop] = block.T
+    out.flush()
+    return stop - start
+
+
+# Function to build a large distance matrix in row tiles across a process pool
+# Workers write straight into a memory-mapped float32 .npy file, so nothing big
+# is pickled and peak memory is one tile per worker plus the page cache
+def build_distance_matrix_blocked(locations, metric="geodesic", path=None,
+                                  workers=None, dtype=np.float32, tile_cells=TILE_CELLS):
+    points = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+    n = len(points)
+    temporary = path is None
+    if temporary:
+        fd, path = tempfile.mkstemp(suffix=".npy")
+        os.close(fd)
+
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(n, n))
+    del out
+
+    # Tiles near the top cover more columns, so keep them small enough to balance
+    tile_rows = max(1, tile_cells // max(n, 1))
+    tiles = [(start, min(start + tile_rows, n)) for start in range(0, n, tile_rows)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_tile_worker,
+                             initargs=(points,)) as pool:
+        futures = [pool.submit(_fill_tile, path, start, stop, metric)
+                   for start, stop in tiles]
+        for future in futures:
+            future.result()
+
+    matrix = np.load(path, mmap_mode="r+")
+    matrix[np.diag_indices(n)] = 0
+    matrix.flush()
+    if temporary:
+        # The mapping stays valid after the file name is removed
+        os.unlink(path)
+    return matrix
+
+
+# Function to compute the full symmetric distance matrix of a point set
+def build_distance_matrix(locations, metric="geodesic"):
+    if len(locations) > BLOCKED_MATRIX_THRESHOLD:
+        return build_distance_matrix_blocked(locations, metric)
+    matrix = pairwise_distances(locations, locations, metric)
+    # Average both triangles so round-off never makes the matrix asymmetric
+    matrix = (matrix + matrix.T) / 2
+    np.fill_diagonal(matrix, 0.0)
+    return matrix
+
+
+# Function to update a matrix after stops are added, removed or reordered
+# Distances between stops kept from old_locations are copied, and only the rows
+# for genuinely new stops are computed, so k added stops cost O(k * n)
+def update_distance_matrix(old_locations, old_matrix, new_locations, metric="geodesic"):
+    old_index = {}
+    for i, location in enumerate(old_locations):
+        old_index.setdefault(tuple(location), i)
+
+    kept_new, kept_old, added = [], [], []
+    for i, location in enumerate(new_locations):
+        j = old_index.get(tuple(location))
+        if j is None:
+            added.append(i)
+        else:
+            kept_new.append(i)
+            kept_old.append(j)
+
+    old_matrix = np.asarray(old_matrix)
+    n = len(new_locations)
+    matrix = np.zeros((n, n), dtype=old_matrix.dtype)
+    matrix[np.ix_(kept_new, kept_new)] = old_matrix[np.ix_(kept_old, kept_old)]
+    if added:
+        points = np.asarray(new_locations, dtype=np.float64).reshape(-1, 2)
+        rows = pairwise_distances(points[added], points, metric)
+        matrix[added, :] = rows
+        matrix[:, added] = rows.T
+        matrix[added, added] = 0
+    return matrix
+
+
+# Symmetric distance matrix stored as its condensed upper triangle
+# Only the n * (n - 1) / 2 off-diagonal cells are kept in one contiguous array
+# (scipy.spatial.distance.squareform order), about 8x smaller than nested lists
+class CondensedDistanceMatrix:
+    def __init__(self, data, n):
+        self.data = data
+        self.n = n
+
+    # Directed matrices (one-way roads) cannot be condensed without losing
+    # one direction, so they are refused rather than silently symmetrized
+    @classmethod
+    def from_dense(cls, matrix, dtype=np.float32):
+        matrix = np.asarray(matrix)
+        n = len(matrix)
+        rows, cols = np.triu_indices(n, k=1)
+        upper = matrix[rows, cols]
+        if not np.allclose(upper, matrix[cols, rows], rtol=1e-6, atol=1e-9):
+            raise ValueError("CondensedDistanceMatrix needs a symmetric matrix; "
+                             "keep directed (road) matrices dense")
+        return cls(upper.astype(dtype), n)
+
+    @classmethod
+    def from_locations(cls, locations, metric="geodesic", dtype=np.float32, tile_cells=TILE_CELLS):
+        points = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+        n = len(points)
+        data = np.empty(n * (n - 1) // 2, dtype=dtype)
+        tile_rows = max(1, tile_cells // max(n, 1))
+        for start in range(0, n, tile_rows):
+            stop = min(start + tile_rows, n)
+            block = pairwise_distances(points[start:stop], points[start:], metric)
+            for i in range(start, stop):
+                offset = cls._offset(i, n)
+                data[offset:offset + n - i - 1] = block[i - start, i - start + 1:]
+        return cls(data, n)
+
+    @staticmethod
+    def _offset(i, n):
+        return n * i - i * (i + 1) // 2
+
+    @property
+    def shape(self):
+        return (self.n, self.n)
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def __len__(self):
+        return self.n
+
+    # Function to return d(i, j) in O(1)
+    def distance(self, i, j):
+        if i == j:
+            return 0.0
+        if i > j:
+            i, j = j, i
+        return float(self.data[self._offset(i, self.n) + j - i - 1])
+
+    # Function to look up many distances at once from index arrays
+    def distances(self, rows, cols):
+        rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+        i, j = np.minimum(rows, cols), np.maximum(rows, cols)
+        index = self.n * i - i * (i + 1) // 2 + j - i - 1
+        return np.where(i == j, 0, self.data[np.where(i == j, 0, index)])
+
+    def __getitem__(self, key):
+        i, j = key
+        return self.distance(i, j)
+
+    # Function to return the full distance row of stop i
+    def row(self, i):
+        n = self.n
+        row = np.empty(n, dtype=self.data.dtype)
+        j = np.arange(i)
+        row[:i] = self.data[n * j - j * (j + 1) // 2 + i - j - 1]
+        row[i] = 0
+        offset = self._offset(i, n)
+        row[i + 1:] = self.data[offset:offset + n - i - 1]
+        return row
+
+    def to_dense(self):
+        matrix = np.zeros((self.n, self.n), dtype=self.data.dtype)
+        rows, cols = np.triu_indices(self.n, k=1)
+        matrix[rows, cols] = self.data
+        matrix[cols, rows] = self.data
+        return matrix
+
+    def __array__(self, dtype=None, copy=None):
+        matrix = self.to_dense()
+        return matrix if dtype is None else matrix.astype(dtype)
+
+
+# Dense matrices up to this size are read through nested Python lists, which
+# index faster than ndarray scalars at the cost of n^2 Python floats
+LIST_ACCESS_THRESHOLD = 1000
+
+
+# Function to turn any data-model matrix into a d(i, j) callable for solvers
+# Works for dense arrays and memmaps, CondensedDistanceMatrix and
+# SparseDistanceGraph (anything with a distance(i, j) method)
+def distance_function(matrix):
+    if hasattr(matrix, "distance"):
+        return matrix.distance
+    if isinstance(matrix, np.ndarray):
+        if len(matrix) <= LIST_ACCESS_THRESHOLD:
+            rows = matrix.tolist()
+            return lambda i, j: rows[i][j]
+        return matrix.item
+    return lambda i, j: matrix[i][j]
+
+
+# Function to turn a data-model matrix into a vectorized lookup d(rows, cols)
+# over index arrays, for batched kernels; None for matrices without one
+# (sparse graphs), which callers then read one distance at a time
+def batch_distance_function(matrix):
+    if isinstance(matrix, np.ndarray):
+        return lambda rows, cols: matrix[rows, cols]
+    if hasattr(matrix, "distances"):
+        return matrix.distances
+    return None
+
+
+# Function to materialize any data-model matrix as a dense float64 array
+def dense_matrix(matrix):
+    if isinstance(matrix, np.ndarray):
+        return np.asarray(matrix, dtype=np.float64)
+    if hasattr(matrix, "to_dense"):
+        return matrix.to_dense().astype(np.float64)
+    if hasattr(matrix, "row"):
+        return np.array([matrix.row(i) for i in range(len(matrix))], dtype=np.float64)
+    return np.asarray(matrix, dtype=np.float64)
+
+
+# Function to check whether d(i, j) == d(j, i) for a data-model matrix
+# Condensed matrices and sparse graphs are symmetric by construction; dense
+# arrays compare each square tile above the diagonal with its mirror tile, so
+# every cell is read once and memmaps stream from disk in blocks
+def is_symmetric(matrix, tile_cells=TILE_CELLS):
+    if not isinstance(matrix, np.ndarray):
+        return True
+    n = len(matrix)
+    size = max(1, int(tile_cells ** 0.5))
+    for top in range(0, n, size):
+        for left in range(top, n, size):
+            if not np.allclose(matrix[top:top + size, left:left + size],
+                               matrix[left:left + size, top:top + size].T, rtol=1e-6, atol=1e-9):
+                return False
+    return True
+
+
+# Function to raise for directed matrices in solvers whose move gains assume
+# d(i, j) == d(j, i) (everything except Held-Karp); symmetric=True or False
+# (e.g. a data model's 'symmetric' flag) is trusted instead of scanning
+def require_symmetric(matrix, solver, symmetric=None):
+    if not (is_symmetric(matrix) if symmetric is None else symmetric):
+        raise ValueError(f"{solver} needs a symmetric distance matrix; solve directed "
+                         "(road) matrices with held_karp or pass symmetrized(matrix)")
+
+
+# Function to average both directions of a directed dense matrix, giving the
+# symmetric matrix the heuristics search on
+def symmetrized(matrix):
+    matrix = np.asarray(matrix, dtype=np.float64)
+    return (matrix + matrix.T) / 2
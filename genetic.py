@@ -0,0 +1,68 @@
+import numpy as np
+
+from distance_matrix import batch_distance_function, distance_function
+
+# Default number of tours kept in the population
+POPULATION_SIZE = 32
+# Share of children that get a random 2-opt (segment reversal) mutation
+MUTATION_RATE = 0.3
+
+
+# Function to compute the lengths of many path tours at once
+# Dense and condensed matrices are read with one fancy-indexing lookup per
+# batch; other matrices (sparse graphs) fall back to d(i, j) per edge
+def tour_lengths(tours, matrix):
+    tours = np.asarray(tours, dtype=np.int64)
+    rows, cols = tours[:, :-1], tours[:, 1:]
+    batch_distance = batch_distance_function(matrix)
+    if batch_distance is not None:
+        return np.asarray(batch_distance(rows, cols), dtype=np.float64).sum(axis=1)
+    distance = distance_function(matrix)
+    return np.array([sum(distance(int(i), int(j)) for i, j in zip(row, col))
+                     for row, col in zip(rows, cols)], dtype=np.float64)
+
+
+# Function to apply order crossover (OX) to two path tours with the same ends
+# A random slice of the first parent's interior is kept in place and the
+# remaining stops are filled in the order they appear in the second parent
+# rng here and below is a numpy Generator
+def order_crossover(first, second, rng):
+    n = len(first)
+    if n < 4:
+        return list(first)
+    i, j = sorted(int(k) for k in rng.choice(np.arange(1, n - 1), 2, replace=False))
+    kept = first[i:j + 1]
+    kept_set = set(kept)
+    rest = [stop for stop in second[1:-1] if stop not in kept_set]
+    offset = i - 1
+    return [first[0]] + rest[:offset] + kept + rest[offset:] + [first[-1]]
+
+
+# Function to mutate a path tour in place by reversing random interior segments
+def mutate(tour, rng, count=1):
+    if len(tour) < 4:
+        return tour
+    for _ in range(count):
+        i, j = sorted(int(k) for k in rng.choice(np.arange(1, len(tour) - 1), 2, replace=False))
+        tour[i:j + 1] = reversed(tour[i:j + 1])
+    return tour
+
+
+# Function to list the stops on edges of `tour` that none of `parents` has
+# Local search after crossover and mutation only needs to start from these
+def changed_stops(tour, *parents):
+    edges = set()
+    for parent in parents:
+        edges.update(zip(parent, parent[1:]))
+        edges.update(zip(parent[1:], parent))
+    stops = set()
+    for a, b in zip(tour, tour[1:]):
+        if (a, b) not in edges:
+            stops.update((a, b))
+    return list(stops)
+
+
+# Function to pick a parent index by binary tournament (shorter tour wins)
+def tournament(lengths, rng):
+    a, b = (int(k) for k in rng.integers(len(lengths), size=2))
+    return a if lengths[a] <= lengths[b] else b
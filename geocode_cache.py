@@ -0,0 +1,66 @@
+import os
+import re
+import time
+
+from sqlite_store import SQLiteStore
+
+# Default location of the shared geocode cache database
+DEFAULT_CACHE_PATH = os.environ.get("ROUTEMAP_GEOCODE_CACHE", ".geocode_cache.sqlite")
+DEFAULT_TTL = 30 * 24 * 3600
+DEFAULT_NEGATIVE_TTL = 24 * 3600
+DEFAULT_MAX_ENTRIES = 100_000
+
+
+# Function to fold case, punctuation and whitespace out of an address
+def normalize_address(address):
+    address = re.sub(r"[^\w\s]", " ", address.casefold())
+    return " ".join(address.split())
+
+
+# Persistent geocode cache in SQLite, shared by every session and process
+# Entries expire after ttl seconds (negative_ttl for addresses Photon could not
+# resolve) and the least recently used ones are evicted beyond max_entries
+class GeocodeCache(SQLiteStore):
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL,
+                 negative_ttl=DEFAULT_NEGATIVE_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        super().__init__(path, "geocodes", max_entries)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS geocodes (
+                    key TEXT PRIMARY KEY,
+                    latitude REAL,
+                    longitude REAL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS geocodes_accessed ON geocodes (accessed)")
+
+    # Function to look up an address; returns (found, (latitude, longitude) or None)
+    def get(self, address):
+        key = normalize_address(address)
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute("SELECT latitude, longitude, created FROM geocodes WHERE key = ?",
+                               (key,)).fetchone()
+            if row is None:
+                return False, None
+            latitude, longitude, created = row
+            ttl = self.negative_ttl if latitude is None else self.ttl
+            if now - created > ttl:
+                conn.execute("DELETE FROM geocodes WHERE key = ?", (key,))
+                return False, None
+            conn.execute("UPDATE geocodes SET accessed = ? WHERE key = ?", (now, key))
+        if latitude is None:
+            return True, None
+        return True, (latitude, longitude)
+
+    # Function to store a result; coordinates=None records a failed lookup
+    def put(self, address, coordinates):
+        latitude, longitude = coordinates if coordinates is not None else (None, None)
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?)",
+                         (normalize_address(address), latitude, longitude, now, now))
+            self._evict(conn)
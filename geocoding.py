@@ -0,0 +1,90 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from http_client import HttpClient
+
+# Photon endpoint; point it at a self-hosted or local stub server when needed
+PHOTON_URL = os.environ.get("PHOTON_URL", "https://photon.komoot.io/api/")
+# Client-side request rate limit (requests per second) towards Photon
+PHOTON_RATE = float(os.environ.get("PHOTON_RATE", "10"))
+# Addresses resolved at the same time by geocode_addresses
+DEFAULT_CONCURRENCY = 8
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+# Function to return the process-wide pooled, rate-limited Photon client
+def get_default_client():
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HttpClient(pool_size=DEFAULT_CONCURRENCY, rate=PHOTON_RATE)
+        return _default_client
+
+
+# Function to pull (address, latitude, longitude) out of a Photon response
+def parse_photon_response(address, results):
+    if results.get('features'):
+        first_result = results['features'][0]
+        latitude = first_result['geometry']['coordinates'][1]
+        longitude = first_result['geometry']['coordinates'][0]
+        return address, latitude, longitude
+    return None
+
+
+# Geocode addresses using Photon API
+# With a GeocodeCache, hits skip the request and only definite answers are
+# cached (a found location, or a successful response with no features)
+# deadline is an absolute time.monotonic() value shared by all retries
+def geocode_address(address, client=None, base_url=None, cache=None, deadline=None):
+    if cache is not None:
+        found, coordinates = cache.get(address)
+        if found:
+            return None if coordinates is None else (address, *coordinates)
+
+    client = client or get_default_client()
+    try:
+        response = client.get(base_url or PHOTON_URL, params={'q': address}, deadline=deadline)
+        if response.status_code == 200:
+            result = parse_photon_response(address, response.json())
+            if cache is not None:
+                cache.put(address, None if result is None else result[1:])
+            return result
+    except (requests.RequestException, ValueError, KeyError, IndexError):
+        pass
+    return None
+
+
+# Function to geocode many addresses concurrently over one pooled client
+# Results keep the input order; an address that fails, or is not resolved
+# within total_timeout seconds, resolves to None
+async def geocode_addresses_async(addresses, concurrency=DEFAULT_CONCURRENCY, client=None,
+                                  base_url=None, cache=None, total_timeout=None):
+    client = client or get_default_client()
+    deadline = None if total_timeout is None else time.monotonic() + total_timeout
+    semaphore = asyncio.Semaphore(concurrency)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    loop = asyncio.get_running_loop()
+
+    async def geocode_one(address):
+        async with semaphore:
+            return await loop.run_in_executor(executor, geocode_address, address, client,
+                                              base_url, cache, deadline)
+
+    try:
+        return await asyncio.gather(*(geocode_one(address) for address in addresses))
+    finally:
+        executor.shutdown(wait=False)
+
+
+# Function to geocode many addresses concurrently from synchronous code
+def geocode_addresses(addresses, concurrency=DEFAULT_CONCURRENCY, client=None, base_url=None,
+                      cache=None, total_timeout=None):
+    return asyncio.run(geocode_addresses_async(addresses, concurrency, client, base_url, cache,
+                                               total_timeout))
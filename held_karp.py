@@ -0,0 +1,62 @@
+import numpy as np
+
+from distance_matrix import dense_matrix
+
+# Routes with at most this many stops are solved exactly by default
+EXACT_THRESHOLD = 15
+# Largest route held_karp accepts: the tables hold 2^(n-2) * (n-2) entries,
+# about 300 MiB and 2 s at 22 stops, and every further stop doubles both
+MAX_EXACT_STOPS = 22
+
+
+# Function to solve the fixed-endpoint path exactly with Held-Karp dynamic programming
+# cost[S, j] is the shortest path from the first stop through the interior stops
+# in bitmask S ending at j; each (subset size, j) layer is one NumPy operation,
+# so O(2^m * m^2) work runs in about m^2 vectorized steps for m interior stops
+# Routes above MAX_EXACT_STOPS raise ValueError instead of exhausting memory
+def held_karp(distance_matrix):
+    n = len(distance_matrix)
+    if n > MAX_EXACT_STOPS:
+        raise ValueError(f"held_karp solves at most {MAX_EXACT_STOPS} stops exactly, got {n}; "
+                         "use another method for larger routes")
+    matrix = dense_matrix(distance_matrix)
+    if n <= 2:
+        return list(range(n)), float(matrix[0, n - 1]) if n == 2 else 0.0
+
+    m = n - 2
+    interior = matrix[1:-1, 1:-1]
+    from_start = matrix[0, 1:-1]
+    to_end = matrix[1:-1, -1]
+
+    masks = np.arange(1 << m)
+    sizes = np.zeros(1 << m, dtype=np.int8)
+    for j in range(m):
+        sizes += (masks >> j) & 1
+
+    cost = np.full((1 << m, m), np.inf)
+    parent = np.full((1 << m, m), -1, dtype=np.int8)
+    singletons = 1 << np.arange(m)
+    cost[singletons, np.arange(m)] = from_start
+
+    for size in range(2, m + 1):
+        layer = masks[sizes == size]
+        for j in range(m):
+            subsets = layer[(layer >> j) & 1 == 1]
+            candidates = cost[subsets ^ (1 << j)] + interior[:, j]
+            best = np.argmin(candidates, axis=1)
+            cost[subsets, j] = candidates[np.arange(len(subsets)), best]
+            parent[subsets, j] = best
+
+    full = (1 << m) - 1
+    totals = cost[full] + to_end
+    j = int(np.argmin(totals))
+    best_distance = float(totals[j])
+
+    path = []
+    mask = full
+    while j >= 0:
+        path.append(j + 1)
+        previous = int(parent[mask, j])
+        mask ^= 1 << j
+        j = previous
+    return [0] + path[::-1] + [n - 1], best_distance
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from seeding import make_rng
+
+DEFAULT_POOL_SIZE = 8
+# (connect, read) timeout in seconds for a single attempt
+DEFAULT_TIMEOUT = (3.05, 10)
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 8.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# Function to create an HTTP session whose keep-alive pool fits the concurrency
+def create_session(pool_size=DEFAULT_POOL_SIZE):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Thread-safe token bucket: at most `rate` requests per second, bursts of `capacity`
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Function to take one token, waiting for it; fails if it arrives after deadline
+    def acquire(self, deadline=None):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                raise requests.Timeout("rate limit wait exceeds deadline")
+            time.sleep(wait)
+
+
+# Pooled HTTP client with timeouts, deadlines, retries and client-side rate limiting
+# 429 and 5xx responses and connection errors are retried with full-jitter
+# exponential backoff (honouring Retry-After), never past the caller's deadline
+# seed (an int or numpy Generator) fixes the jitter; each client has its own stream
+class HttpClient:
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, rate=None, timeout=DEFAULT_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF,
+                 max_backoff=DEFAULT_MAX_BACKOFF, seed=None):
+        self.session = create_session(pool_size)
+        self.rng = make_rng(seed)
+        self.limiter = TokenBucket(rate) if rate else None
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    # Function to GET a URL; deadline is an absolute time.monotonic() value
+    def get(self, url, params=None, timeout=None, deadline=None):
+        timeout = timeout or self.timeout
+        for attempt in range(self.max_retries + 1):
+            if self.limiter is not None:
+                self.limiter.acquire(deadline)
+            attempt_timeout = self._clip_timeout(timeout, deadline)
+            retry_after = None
+            try:
+                response = self.session.get(url, params=params, timeout=attempt_timeout)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+                retry_after = response.headers.get("Retry-After")
+                response.close()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+
+            delay = self.rng.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            if retry_after is not None and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise requests.Timeout("retry backoff exceeds deadline")
+            time.sleep(delay)
+
+    @staticmethod
+    def _clip_timeout(timeout, deadline):
+        if deadline is None:
+            return timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.Timeout("deadline exceeded")
+        if isinstance(timeout, tuple):
+            return tuple(min(t, remaining) for t in timeout)
+        return min(timeout, remaining)
+
+    def close(self):
+        self.session.close()
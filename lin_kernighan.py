@@ -0,0 +1,131 @@
+import numpy as np
+
+from annealing import tour_length
+from anytime import Budget
+from distance_matrix import distance_function, require_symmetric
+from local_search import EPSILON, LocalSearch, candidate_lists
+from seeding import make_rng
+
+DEFAULT_CANDIDATES = 8
+# Deepest chain of 2-opt steps explored by one LK move
+MAX_DEPTH = 50
+
+
+# Lin-Kernighan style variable-depth search over an array-based path tour
+# Each LK move is a chain of 2-opt steps that keeps stop t1 fixed: remove
+# (t1, t2), add (t2, t3), remove (t3, t4) and continue from t4 while the
+# cumulative gain stays positive, then keep the best prefix of the chain.
+# Chains are combined with Or-opt segment moves, and the first and last stops
+# never move (edges removed are always path edges)
+class LinKernighan(LocalSearch):
+    def __init__(self, tour, distance, candidates, moves=("lk", "or_opt"), max_depth=MAX_DEPTH):
+        super().__init__(tour, distance, candidates, moves)
+        self.max_depth = max_depth
+
+    def _reverse(self, i, j):
+        t = self.tour
+        t[i:j + 1] = reversed(t[i:j + 1])
+        self._update_positions(i, j)
+
+    # Function to find the reversal that adds (t2, t3) and removes (t3, t4)
+    def _lk_step(self, p, side, q):
+        if side == 1:
+            return (p + 1, q - 1) if q > p else (q, p)
+        return (q + 1, p - 1) if q < p else (p, q)
+
+    def _try_lk(self, t1):
+        t, d, n = self.tour, self.distance, self.n
+        for side in (1, -1):
+            p = self.pos[t1]
+            if not 0 <= p + side < n:
+                continue
+            t2 = t[p + side]
+            gain = d(t1, t2)
+            added = set()
+            steps = []
+            touched = [t1, t2]
+            best_gain, best_steps = EPSILON, 0
+
+            while len(steps) < self.max_depth:
+                p = self.pos[t1]
+                side = self.pos[t2] - p
+                choice = None
+                for t3 in self.candidates[t2]:
+                    g1 = gain - d(t2, t3)
+                    if g1 <= EPSILON:
+                        break
+                    if t3 == t1:
+                        continue
+                    q = self.pos[t3]
+                    t4 = t[q - side] if 0 <= q - side < n else None
+                    if t4 is None or t4 == t2 or (min(t3, t4), max(t3, t4)) in added:
+                        continue
+                    i, j = self._lk_step(p, side, q)
+                    if not 1 <= i < j <= n - 2:
+                        continue
+                    score = g1 + d(t3, t4)
+                    if choice is None or score > choice[0]:
+                        choice = (score, g1, t3, t4, i, j)
+                if choice is None:
+                    break
+
+                score, g1, t3, t4, i, j = choice
+                self._reverse(i, j)
+                steps.append((i, j))
+                added.add((min(t2, t3), max(t2, t3)))
+                touched += [t3, t4]
+                gain = score
+                closing = score - d(t4, t1)
+                if closing > best_gain:
+                    best_gain, best_steps = closing, len(steps)
+                t2 = t4
+
+            # Undo the steps past the best closing point
+            for i, j in reversed(steps[best_steps:]):
+                self._reverse(i, j)
+            if best_steps:
+                return touched
+        return None
+
+
+# Function to apply a double-bridge kick to the interior of a path tour
+# rng is a numpy Generator
+def double_bridge(tour, rng):
+    n = len(tour)
+    a, b, c = sorted(int(k) for k in rng.choice(np.arange(1, n - 1), 3, replace=False))
+    return tour[:a] + tour[b:c] + tour[a:b] + tour[c:], (tour[a - 1], tour[a], tour[b - 1],
+                                                         tour[b], tour[c - 1], tour[c])
+
+
+# Function to run iterated Lin-Kernighan on a path tour with fixed ends
+# After the first descent, each kick perturbs the best tour with a double
+# bridge and re-optimizes only around the kicked edges
+# budget (an anytime.Budget) counts kicks and replaces the fixed kick count;
+# its time limit also cuts short the candidate lists, the first descent and
+# each re-optimization
+# rng (a seed or numpy Generator) makes the kicks reproducible
+# Gains assume d(i, j) == d(j, i), so directed matrices are refused;
+# symmetric=True skips the check when the caller already knows
+def lin_kernighan(tour, distance_matrix, kicks=None, neighbors=DEFAULT_CANDIDATES,
+                  candidates=None, budget=None, rng=None, symmetric=None):
+    require_symmetric(distance_matrix, "lin_kernighan", symmetric)
+    rng = make_rng(rng)
+    distance = distance_function(distance_matrix)
+    budget = budget or Budget(max_iterations=len(tour) if kicks is None else kicks)
+    candidates = candidates or candidate_lists(distance_matrix, neighbors, budget=budget)
+    best_tour = LinKernighan(tour, distance, candidates).run(budget=budget)
+    best_distance = tour_length(best_tour, distance)
+    if len(best_tour) < 8:
+        budget.stop_reason = "trivial"
+        return best_tour, best_distance
+
+    while not budget.exhausted(best_distance):
+        kicked, touched = double_bridge(best_tour, rng)
+        search = LinKernighan(kicked, distance, candidates)
+        candidate = search.run(touched, budget)
+        candidate_distance = tour_length(candidate, distance)
+        improved = candidate_distance < best_distance - EPSILON
+        if improved:
+            best_tour, best_distance = candidate, candidate_distance
+        budget.record(improved)
+    return best_tour, best_distance
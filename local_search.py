@@ -0,0 +1,202 @@
+from collections import deque
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from annealing import tour_length
+from distance_matrix import (TILE_CELLS, batch_distance_function, distance_function,
+                             require_symmetric)
+from sparse_graph import to_unit_sphere
+
+DEFAULT_CANDIDATES = 10
+# Longest segment moved by Or-opt (length 1 is plain node insertion)
+MAX_SEGMENT = 3
+EPSILON = 1e-10
+# Share of a time limit held back for the 2-opt/Or-opt polish that follows a
+# time-limited annealing run, which would otherwise leave it no time at all
+POLISH_TIME_SHARE = 0.2
+
+
+# Function to return one full distance row of any data-model matrix
+def matrix_row(matrix, i):
+    if hasattr(matrix, "row"):
+        return np.asarray(matrix.row(i))
+    return np.asarray(matrix[i])
+
+
+# Function to build each stop's k nearest candidate list, nearest first
+# locations (for great-circle matrices) finds the neighbours with a KD-tree
+# on the unit sphere and orders them by the matrix; other dense matrices are
+# scanned in row tiles, one argpartition per tile. budget (an anytime.Budget)
+# stops a scan at its time limit, leaving the remaining lists empty
+def candidate_lists(matrix, k=DEFAULT_CANDIDATES, locations=None, budget=None):
+    n = len(matrix)
+    k = min(k, n - 1)
+    if k <= 0:
+        return [[] for _ in range(n)]
+    if hasattr(matrix, "neighbors"):
+        lists = []
+        for i in range(n):
+            indices, distances = matrix.neighbors(i)
+            lists.append([int(j) for j in indices[np.argsort(distances)][:k]])
+        return lists
+
+    batch_distance = batch_distance_function(matrix) if locations is not None else None
+    if batch_distance is not None:
+        xyz = to_unit_sphere(locations)
+        _, neighbors = cKDTree(xyz).query(xyz, k=k + 1)
+        weights = np.asarray(batch_distance(np.arange(n)[:, None], neighbors), dtype=np.float64)
+        weights[neighbors == np.arange(n)[:, None]] = np.inf
+        order = np.argsort(weights, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(neighbors, order, axis=1).tolist()
+
+    lists = [[] for _ in range(n)]
+    tile_rows = max(1, TILE_CELLS // n) if isinstance(matrix, np.ndarray) else 1
+    for start in range(0, n, tile_rows):
+        if budget is not None and budget.out_of_time():
+            break
+        stop = min(start + tile_rows, n)
+        if isinstance(matrix, np.ndarray):
+            tile = np.array(matrix[start:stop], dtype=np.float64)
+        else:
+            tile = matrix_row(matrix, start).astype(np.float64)[None, :]
+        tile[np.arange(stop - start), np.arange(start, stop)] = np.inf
+        nearest = np.argpartition(tile, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(tile, nearest, axis=1), axis=1, kind="stable")
+        lists[start:stop] = np.take_along_axis(nearest, order, axis=1).tolist()
+    return lists
+
+
+# 2-opt and Or-opt improvement of a path tour with fixed first and last stops
+# Moves are only tried towards each stop's candidate neighbours, and a
+# don't-look-bit queue revisits only stops whose edges changed, so a pass is
+# close to linear in the number of stops
+# Gains assume a symmetric metric (a reversed segment keeps its length); the
+# public entry points refuse directed matrices via require_symmetric
+class LocalSearch:
+    def __init__(self, tour, distance, candidates, moves=("two_opt", "or_opt")):
+        self.tour = list(tour)
+        self.n = len(self.tour)
+        self.pos = [0] * (max(self.tour) + 1 if self.tour else 0)
+        self._update_positions(0, self.n - 1)
+        self.distance = distance
+        self.candidates = candidates
+        self.moves = moves
+
+    def _update_positions(self, start, stop):
+        for k in range(start, stop + 1):
+            self.pos[self.tour[k]] = k
+
+    # Function to score reversing tour[i..j]; positive values shorten the tour
+    def _two_opt_gain(self, i, j):
+        t, d = self.tour, self.distance
+        return d(t[i - 1], t[i]) + d(t[j], t[j + 1]) - d(t[i - 1], t[j]) - d(t[i], t[j + 1])
+
+    def _apply_two_opt(self, i, j):
+        t = self.tour
+        touched = (t[i - 1], t[i], t[j], t[j + 1])
+        t[i:j + 1] = reversed(t[i:j + 1])
+        self._update_positions(i, j)
+        return touched
+
+    # Function to try 2-opt moves that create an edge from a to a candidate
+    def _try_two_opt(self, a):
+        t, d, n = self.tour, self.distance, self.n
+        p = self.pos[a]
+        for side in (1, -1):
+            if not 0 <= p + side < n:
+                continue
+            current = d(a, t[p + side])
+            for c in self.candidates[a]:
+                if d(a, c) >= current - EPSILON:
+                    break
+                q = self.pos[c]
+                if side == 1:
+                    i, j = (p + 1, q) if q > p else (q + 1, p)
+                else:
+                    i, j = (q, p - 1) if q < p else (p, q - 1)
+                if 1 <= i < j <= n - 2 and self._two_opt_gain(i, j) > EPSILON:
+                    return self._apply_two_opt(i, j)
+        return None
+
+    # Function to try moving a 1-3 stop segment that starts or ends at a
+    # so that a becomes adjacent to one of its candidates
+    def _try_or_opt(self, a):
+        t, d, n = self.tour, self.distance, self.n
+        p = self.pos[a]
+        for length in range(1, MAX_SEGMENT + 1):
+            for s in ((p,) if length == 1 else (p, p - length + 1)):
+                e = s + length - 1
+                if s < 1 or e > n - 2:
+                    continue
+                first, last = t[s], t[e]
+                prev, nxt = t[s - 1], t[e + 1]
+                removal = d(prev, first) + d(last, nxt) - d(prev, nxt)
+                if removal <= EPSILON:
+                    continue
+                for c in self.candidates[a]:
+                    q = self.pos[c]
+                    if s <= q <= e:
+                        continue
+                    # Insert between (c, succ c) or (pred c, c); u sits at position r
+                    for r in (q, q - 1):
+                        if r < 0 or r + 1 > n - 1 or s - 1 <= r <= e:
+                            continue
+                        u, v = t[r], t[r + 1]
+                        forward = d(u, first) + d(last, v)
+                        backward = d(u, last) + d(first, v)
+                        insertion = min(forward, backward) - d(u, v)
+                        if removal - insertion > EPSILON:
+                            return self._apply_or_opt(s, e, r, backward < forward)
+        return None
+
+    def _apply_or_opt(self, s, e, r, reverse):
+        t = self.tour
+        touched = (t[s - 1], t[s], t[e], t[e + 1], t[r], t[r + 1])
+        segment = t[s:e + 1]
+        if reverse:
+            segment.reverse()
+        del t[s:e + 1]
+        insert_at = r + 1 if r < s else r + 1 - len(segment)
+        t[insert_at:insert_at] = segment
+        self._update_positions(min(s, insert_at), max(e, insert_at + len(segment) - 1))
+        return touched
+
+    # Function to improve until no queued stop has an improving move
+    # nodes limits the initial queue, e.g. to the stops touched by a kick;
+    # budget (an anytime.Budget) stops the search at its time limit
+    def run(self, nodes=None, budget=None):
+        if self.n < 4:
+            return self.tour
+        tries = [getattr(self, f"_try_{move}") for move in self.moves]
+
+        queue = deque(self.tour if nodes is None else nodes)
+        queued = set(queue)
+        while queue and not (budget is not None and budget.out_of_time()):
+            a = queue.popleft()
+            queued.discard(a)
+            for try_move in tries:
+                touched = try_move(a)
+                if touched is not None:
+                    # Reset the don't-look bits of every stop whose edges changed
+                    for node in touched:
+                        if node not in queued:
+                            queue.append(node)
+                            queued.add(node)
+                    break
+        return self.tour
+
+
+# Function to improve a path tour with 2-opt and Or-opt local search
+# nodes limits the first pass to those stops (e.g. the ends of edges a
+# perturbation created); by default every stop is tried
+# budget (an anytime.Budget) stops the search, candidate lists included, at
+# its time limit; symmetric=True skips the symmetry scan when the caller
+# already knows the matrix is symmetric
+def local_search(tour, distance_matrix, neighbors=DEFAULT_CANDIDATES, moves=("two_opt", "or_opt"),
+                 candidates=None, nodes=None, budget=None, symmetric=None):
+    require_symmetric(distance_matrix, "local_search", symmetric)
+    distance = distance_function(distance_matrix)
+    candidates = candidates or candidate_lists(distance_matrix, neighbors, budget=budget)
+    improved = LocalSearch(tour, distance, candidates, moves).run(nodes, budget)
+    return improved, tour_length(improved, distance)
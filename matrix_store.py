@@ -0,0 +1,109 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+from distance_matrix import (BLOCKED_MATRIX_THRESHOLD, build_distance_matrix,
+                             build_distance_matrix_blocked)
+
+# Default location of the on-disk matrix store, overridable per deployment
+DEFAULT_STORE_DIR = os.environ.get("ROUTEMAP_MATRIX_DIR", ".matrix_cache")
+# Least recently used matrices are evicted once the store grows past this size
+DEFAULT_MAX_BYTES = int(os.environ.get("ROUTEMAP_MATRIX_MAX_BYTES", 4 * 1024 ** 3))
+# Matrices being written carry this suffix, so eviction never sees them
+PARTIAL_SUFFIX = ".npy.partial"
+
+
+# Function to compute a content hash for a coordinate set and metric
+def matrix_key(locations, metric):
+    points = np.ascontiguousarray(np.asarray(locations, dtype=np.float64).reshape(-1, 2))
+    digest = hashlib.sha256()
+    digest.update(metric.encode())
+    digest.update(points.tobytes())
+    return digest.hexdigest()
+
+
+# Function to pick the stored dtype for an n-stop matrix: float64 like
+# build_distance_matrix, float32 above BLOCKED_MATRIX_THRESHOLD like the tiled
+# build, so each key always holds the same dtype whichever path wrote it
+def matrix_dtype(n):
+    return np.float64 if n <= BLOCKED_MATRIX_THRESHOLD else np.float32
+
+
+# Persistent store of distance matrices as memory-mapped .npy files
+# Files are content-addressed, so every process and every restart sees the same
+# matrix for the same coordinates and metric and can open it zero-copy.
+# Every read touches the file's mtime, and writes evict the least recently
+# used files beyond max_bytes (open memory maps stay valid after the unlink)
+class MatrixStore:
+    def __init__(self, directory=DEFAULT_STORE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, locations, metric):
+        return os.path.join(self.directory, f"{matrix_key(locations, metric)}.npy")
+
+    def get(self, locations, metric):
+        path = self.path_for(locations, metric)
+        try:
+            matrix = np.load(path, mmap_mode="r")
+            os.utime(path)
+            return matrix
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, locations, metric, matrix):
+        path = self.path_for(locations, metric)
+        fd, tmp_path = tempfile.mkstemp(suffix=PARTIAL_SUFFIX, dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.asarray(matrix, dtype=matrix_dtype(len(matrix))))
+        # Atomic rename: concurrent writers of the same key produce identical files
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return np.load(path, mmap_mode="r")
+
+    # Function to delete the least recently used matrices until the store fits
+    # in max_bytes; `keep` (the file just written) is never deleted
+    def evict(self, keep=None):
+        if self.max_bytes is None:
+            return
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy") and entry.path != keep:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        if keep is not None and os.path.exists(keep):
+            total += os.path.getsize(keep)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def get_or_build(self, locations, metric="geodesic"):
+        matrix = self.get(locations, metric)
+        if matrix is not None:
+            return matrix
+
+        if len(locations) <= BLOCKED_MATRIX_THRESHOLD:
+            return self.put(locations, metric, build_distance_matrix(locations, metric))
+
+        # Large matrices are written by the tile workers directly into the store
+        fd, tmp_path = tempfile.mkstemp(suffix=PARTIAL_SUFFIX, dir=self.directory)
+        os.close(fd)
+        matrix = build_distance_matrix_blocked(locations, metric, path=tmp_path,
+                                               dtype=matrix_dtype(len(locations)))
+        del matrix
+        path = self.path_for(locations, metric)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return np.load(path, mmap_mode="r")
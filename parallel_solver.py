@@ -0,0 +1,357 @@
+import math as python_math  # Using python-math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from annealing import annealing_chain, make_schedule, sample_move_deltas, tour_length
+from anytime import Budget
+from construction import random_tour
+from cooling import FixedSchedule
+from distance_matrix import CondensedDistanceMatrix, distance_function, require_symmetric
+from genetic import (MUTATION_RATE, POPULATION_SIZE, changed_stops, mutate, order_crossover,
+                     tour_lengths, tournament)
+from lin_kernighan import lin_kernighan
+from local_search import POLISH_TIME_SHARE, candidate_lists, local_search
+from seeding import make_rng
+
+# Ratio between the hottest and coldest parallel-tempering replica
+TEMPERATURE_SPAN = 1000
+
+# Per-worker state set up by the pool initializer
+_worker = {}
+
+
+# Function to place a data-model matrix where worker processes can reach it
+# without pickling: dense and condensed arrays go into shared memory, store
+# memmaps are reopened from their file, anything else (sparse graphs) is
+# small enough to send as is
+def share_matrix(matrix):
+    filename = getattr(matrix, "filename", None)
+    if isinstance(matrix, np.memmap) and filename and os.path.exists(filename):
+        return ("memmap", filename), None
+    if isinstance(matrix, CondensedDistanceMatrix):
+        array, kind = matrix.data, "condensed"
+    elif isinstance(matrix, np.ndarray):
+        array, kind = matrix, "dense"
+    else:
+        return ("object", matrix), None
+
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return (kind, shm.name, array.shape, array.dtype.str, len(matrix)), shm
+
+
+# Function to rebuild a shared matrix inside a worker process
+def attach_matrix(spec):
+    kind = spec[0]
+    if kind == "memmap":
+        return np.load(spec[1], mmap_mode="r"), None
+    if kind == "object":
+        return spec[1], None
+    _, name, shape, dtype, n = spec
+    shm = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    if kind == "condensed":
+        return CondensedDistanceMatrix(array, n), shm
+    return array, shm
+
+
+def _init_worker(spec):
+    matrix, shm = attach_matrix(spec)
+    _worker.update(matrix=matrix, shm=shm, distance=distance_function(matrix), candidates=None)
+
+
+def _worker_candidates():
+    if _worker["candidates"] is None:
+        _worker["candidates"] = candidate_lists(_worker["matrix"])
+    return _worker["candidates"]
+
+
+# Function run by each worker for one independent restart
+# Every task gets its own child Generator spawned by the parent process, so
+# results are reproducible whichever worker runs which task. The restart
+# starts from `tour` (a random tour when None) and stops at the wall-clock
+# deadline (a time.time() value; None means none), after iterations moves or
+# kicks, after patience of them without improvement or on reaching target
+def _restart(rng, method, tour, deadline, iterations, patience, target, temperature,
+             cooling_rate, polish, schedule):
+    matrix, distance = _worker["matrix"], _worker["distance"]
+    tour = list(tour) if tour is not None else random_tour(len(matrix), rng)
+    time_limit = None if deadline is None else max(0.0, deadline - time.time())
+    budget = Budget(time_limit, iterations, patience, target)
+    if polish and time_limit is not None and method != "lin_kernighan":
+        budget.time_limit = time_limit * (1 - POLISH_TIME_SHARE)
+    if method == "lin_kernighan":
+        best_tour, best_distance = lin_kernighan(tour, matrix, candidates=_worker_candidates(),
+                                                 budget=budget, rng=rng)
+    else:
+        schedule = make_schedule(schedule, tour, distance, budget, temperature, cooling_rate,
+                                 rng=rng)
+        _, _, best_tour, best_distance = annealing_chain(tour, distance, budget, schedule,
+                                                         rng=rng)
+        if polish:
+            budget.time_limit = time_limit
+            best_tour, best_distance = local_search(best_tour, matrix,
+                                                    candidates=_worker_candidates(),
+                                                    budget=budget, symmetric=True)
+    return best_tour, best_distance, budget.iterations, budget.stop_reason
+
+
+# Function run by each worker for one fixed-temperature tempering sweep
+def _sweep(rng, tour, temperature, iterations):
+    budget = Budget(max_iterations=iterations)
+    return annealing_chain(tour, _worker["distance"], budget, FixedSchedule(temperature),
+                           rng=rng)
+
+
+# Function run by each worker for one batch of genetic-algorithm children
+# Each child is the order crossover of a parent pair, mutated with probability
+# mutation_rate and (polish=True) improved by 2-opt/Or-opt local search,
+# which stops once time_left seconds (None: no limit) have passed; the
+# batch's fitness is then evaluated in one vectorized pass
+# Every child has its own random stream, so a seeded run breeds the same
+# children however the pairs are split across workers
+def _breed(rngs, pairs, mutation_rate, mutations, polish, time_left=None):
+    matrix = _worker["matrix"]
+    budget = Budget(time_left)
+    children = []
+    for rng, (first, second) in zip(rngs, pairs):
+        child = order_crossover(first, second, rng)
+        if rng.random() < mutation_rate:
+            mutate(child, rng, mutations)
+        if polish:
+            child, _ = local_search(child, matrix, candidates=_worker_candidates(),
+                                    nodes=changed_stops(child, first, second), budget=budget,
+                                    symmetric=True)
+        children.append(child)
+    return children, tour_lengths(children, matrix).tolist()
+
+
+# Function to breed children for all parent pairs, one batch per worker
+def _breed_batches(pool, pairs, rng, workers, mutation_rate, mutations, polish, time_left=None):
+    size = -(-len(pairs) // workers)
+    child_rngs = rng.spawn(len(pairs))
+    futures = [pool.submit(_breed, child_rngs[start:start + size], pairs[start:start + size],
+                           mutation_rate, mutations, polish, time_left)
+               for start in range(0, len(pairs), size)]
+    children, lengths = [], []
+    for future in futures:
+        batch_children, batch_lengths = future.result()
+        children += batch_children
+        lengths += batch_lengths
+    return children, lengths
+
+
+# Function to return the seconds left on a budget's time limit (None: no limit)
+def _time_left(budget):
+    if budget.time_limit is None:
+        return None
+    return max(0.0, budget.time_limit - budget.elapsed)
+
+
+# Function to keep the best `size` distinct tours (tours of equal length count
+# as duplicates, which keeps clones from taking over the population)
+def _survivors(tours, lengths, size):
+    survivors, survivor_lengths, seen = [], [], set()
+    for k in sorted(range(len(tours)), key=lengths.__getitem__):
+        key = round(lengths[k], 9)
+        if key in seen:
+            continue
+        seen.add(key)
+        survivors.append(tours[k])
+        survivor_lengths.append(lengths[k])
+        if len(survivors) == size:
+            break
+    return survivors, survivor_lengths
+
+
+# Function to run a memetic genetic algorithm on worker processes
+# The population starts from initial_tour plus copies scrambled by random
+# segment reversals; every generation breeds population_size children from
+# binary-tournament parents (see _breed) and keeps the best distinct tours of
+# parents and children together. budget counts generations
+# seed (an int or numpy Generator) makes the run reproducible
+# symmetric=True skips the symmetry check here and in the other parallel modes
+def parallel_genetic(distance_matrix, initial_tour=None, population_size=POPULATION_SIZE,
+                     workers=None, generations=100, time_limit=None, budget=None,
+                     mutation_rate=MUTATION_RATE, polish=True, seed=None, symmetric=None):
+    require_symmetric(distance_matrix, "parallel_genetic", symmetric)
+    workers = workers or os.cpu_count()
+    budget = budget or Budget(time_limit, None if time_limit is not None else generations)
+    rng = make_rng(seed)
+    n = len(distance_matrix)
+    initial_tour = list(initial_tour) if initial_tour is not None else random_tour(n, rng)
+    scramble = max(1, n // 20)
+
+    spec, shm = share_matrix(distance_matrix)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(spec,)) as pool:
+            population, lengths = _breed_batches(pool, [(initial_tour, initial_tour)]
+                                                 * (population_size - 1), rng, workers,
+                                                 1.0, scramble, polish, _time_left(budget))
+            population.append(initial_tour)
+            lengths += tour_lengths([initial_tour], distance_matrix).tolist()
+            population, lengths = _survivors(population, lengths, population_size)
+
+            while not budget.exhausted(lengths[0]):
+                pairs = [(population[tournament(lengths, rng)],
+                          population[tournament(lengths, rng)])
+                         for _ in range(population_size)]
+                children, child_lengths = _breed_batches(pool, pairs, rng, workers,
+                                                         mutation_rate, 1, polish,
+                                                         _time_left(budget))
+                best_distance = lengths[0]
+                population, lengths = _survivors(population + children, lengths + child_lengths,
+                                                 population_size)
+                budget.record(lengths[0] < best_distance - 1e-12)
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    return {
+        'route': population[0],
+        'distance': lengths[0],
+        'population': len(population),
+        **budget.stats(),
+    }
+
+
+# Function to run independent annealing or Lin-Kernighan restarts in parallel
+# The matrix is shared once per worker; the best tour over all restarts wins
+# seed (an int or numpy Generator) is split into one child stream per restart
+# budget (an anytime.Budget) gives every restart its time left, its
+# max_iterations (moves or kicks per restart), patience and target; the
+# remaining restarts are cancelled once one reaches the target
+# initial_tour (e.g. a constructed or cached tour) seeds every restart;
+# without one each restart starts from its own random tour
+def parallel_multistart(distance_matrix, restarts=None, workers=None, method="annealing",
+                        iterations=1000, time_limit=None, temperature=10000, cooling_rate=0.95,
+                        polish=True, seed=None, schedule="adaptive", budget=None,
+                        initial_tour=None, symmetric=None):
+    require_symmetric(distance_matrix, "parallel_multistart", symmetric)
+    workers = workers or os.cpu_count()
+    restarts = restarts or workers
+    budget = budget or Budget(time_limit, None if time_limit is not None else iterations)
+    rng = make_rng(seed)
+    left = _time_left(budget)
+    deadline = None if left is None else time.time() + left
+    best_tour, best_distance, reasons = None, float("inf"), []
+
+    spec, shm = share_matrix(distance_matrix)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(spec,)) as pool:
+            futures = [pool.submit(_restart, child_rng, method, initial_tour, deadline,
+                                   budget.max_iterations, budget.patience, budget.target,
+                                   temperature, cooling_rate, polish, schedule)
+                       for child_rng in rng.spawn(restarts)]
+            # Results are taken in submission order so seeded runs repeat
+            for future in futures:
+                if future.cancelled():
+                    continue
+                tour, distance, iterations_run, reason = future.result()
+                improved = distance < best_distance - 1e-12
+                if improved:
+                    best_tour, best_distance = tour, distance
+                budget.record(improved, count=iterations_run)
+                reasons.append(reason)
+                if budget.target is not None and best_distance <= budget.target:
+                    for pending in futures:
+                        pending.cancel()
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    if budget.target is not None and best_distance <= budget.target:
+        budget.stop_reason = "target"
+    else:
+        # Every restart ran to its own budget; report the most common reason
+        budget.stop_reason = max(set(reasons), key=reasons.count)
+    return {
+        'route': best_tour,
+        'distance': best_distance,
+        'restarts': len(reasons),
+        **budget.stats(),
+    }
+
+
+# Function to run parallel tempering (replica exchange) across worker processes
+# Replicas walk at fixed temperatures on a geometric ladder calibrated from
+# sampled move deltas; after each sweep neighbouring replicas swap tours with
+# the Metropolis exchange probability, and the best tour seen is returned
+# seed (an int or numpy Generator) is split into child streams for the sweeps
+# budget (an anytime.Budget) counts moves over all replicas, so a sweep is cut
+# short to fit max_iterations; by default sweeps full sweeps are run (or
+# sweeps until time_limit). initial_tour seeds every replica (random when None)
+def parallel_tempering(distance_matrix, replicas=None, workers=None, sweeps=50,
+                       sweep_iterations=10000, time_limit=None, seed=None, budget=None,
+                       initial_tour=None, symmetric=None):
+    require_symmetric(distance_matrix, "parallel_tempering", symmetric)
+    workers = workers or os.cpu_count()
+    replicas = replicas or max(2, workers)
+    rng = make_rng(seed)
+    distance = distance_function(distance_matrix)
+    n = len(distance_matrix)
+
+    if initial_tour is not None:
+        tours = [list(initial_tour) for _ in range(replicas)]
+    else:
+        tours = [random_tour(n, rng) for _ in range(replicas)]
+    uphill = [delta for delta in sample_move_deltas(tours[0], distance, rng=rng) if delta > 0]
+    t_max = sum(uphill) / len(uphill) if uphill else 1.0
+    ratio = TEMPERATURE_SPAN ** (1 / max(replicas - 1, 1))
+    temperatures = [t_max / ratio ** k for k in range(replicas)][::-1]
+
+    energies = [tour_length(tour, distance) for tour in tours]
+    best = min(range(replicas), key=energies.__getitem__)
+    best_tour, best_distance = tours[best][:], energies[best]
+    budget = budget or Budget(time_limit, None if time_limit is not None
+                              else sweeps * sweep_iterations * replicas)
+    exchanges = 0
+    sweep = 0
+
+    spec, shm = share_matrix(distance_matrix)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(spec,)) as pool:
+            while not budget.exhausted(best_distance):
+                moves = sweep_iterations
+                if budget.max_iterations is not None:
+                    remaining = budget.max_iterations - budget.iterations
+                    moves = max(1, min(moves, -(-remaining // replicas)))
+                futures = [pool.submit(_sweep, child_rng, tours[k], temperatures[k], moves)
+                           for k, child_rng in enumerate(rng.spawn(replicas))]
+                improved = False
+                for k, future in enumerate(futures):
+                    tours[k], energies[k], replica_best, replica_distance = future.result()
+                    if replica_distance < best_distance - 1e-12:
+                        best_tour, best_distance, improved = replica_best, replica_distance, True
+
+                for k in range(sweep % 2, replicas - 1, 2):
+                    exponent = ((1 / temperatures[k] - 1 / temperatures[k + 1])
+                                * (energies[k] - energies[k + 1]))
+                    if exponent >= 0 or rng.random() < python_math.exp(exponent):
+                        tours[k], tours[k + 1] = tours[k + 1], tours[k]
+                        energies[k], energies[k + 1] = energies[k + 1], energies[k]
+                        exchanges += 1
+                sweep += 1
+                budget.record(improved, count=moves * replicas)
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    return {
+        'route': best_tour,
+        'distance': best_distance,
+        'replicas': replicas,
+        'sweeps': sweep,
+        'exchanges': exchanges,
+        **budget.stats(),
+    }
@@ -0,0 +1,194 @@
+import bz2
+import gzip
+import re
+import xml.etree.ElementTree as ET
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
+from scipy.spatial import cKDTree
+
+from distance_matrix import paired_distances
+from sparse_graph import to_unit_sphere
+
+# Metrics answered by a RoadNetwork: kilometres and seconds along the roads
+ROAD_METRICS = ("road_distance", "road_duration")
+
+# Default speeds (km/h) for ways without a usable maxspeed tag
+HIGHWAY_SPEEDS = {
+    "motorway": 105, "motorway_link": 70,
+    "trunk": 90, "trunk_link": 60,
+    "primary": 75, "primary_link": 50,
+    "secondary": 65, "secondary_link": 45,
+    "tertiary": 55, "tertiary_link": 40,
+    "unclassified": 45, "residential": 40,
+    "living_street": 15, "service": 20, "road": 40,
+}
+ONEWAY_HIGHWAYS = {"motorway", "motorway_link"}
+# Speed assumed for the stretch between an address and its nearest road node
+SNAP_SPEED_KMH = 20
+# Cells of the dijkstra output kept in memory at once
+DIJKSTRA_BATCH_CELLS = 5_000_000
+
+
+# Function to parse an OSM maxspeed tag into km/h (None when unusable)
+def parse_maxspeed(value):
+    match = re.match(r"\s*(\d+(?:\.\d+)?)\s*(mph)?", value or "")
+    if not match:
+        return None
+    speed = float(match.group(1))
+    return speed * 1.609344 if match.group(2) else speed
+
+
+# Function to open a plain, gzip or bz2 compressed .osm XML extract
+def open_osm(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+# Drivable road graph in CSR form, loaded from a local OSM extract
+# Shortest paths run in scipy's compiled dijkstra over the CSR arrays, so
+# many-to-many matrices need no network access and no per-edge Python work
+class RoadNetwork:
+    def __init__(self, coordinates, indptr, indices, lengths, durations):
+        self.coordinates = coordinates
+        n = len(coordinates)
+        self.distance_graph = csr_matrix((lengths, indices, indptr), shape=(n, n))
+        self.duration_graph = csr_matrix((durations, indices, indptr), shape=(n, n))
+
+        # Only snap to the largest strongly connected component, so every
+        # pair of snapped stops is mutually reachable
+        _, labels = connected_components(self.distance_graph, directed=True, connection="strong")
+        largest = np.argmax(np.bincount(labels)) if n else 0
+        self.snap_nodes = np.flatnonzero(labels == largest)
+        self.snap_tree = cKDTree(to_unit_sphere(coordinates[self.snap_nodes]))
+
+    @classmethod
+    def from_osm(cls, path):
+        node_coordinates = {}
+        edges = []
+        with open_osm(path) as f:
+            # Finished elements are cleared and dropped from the root, so
+            # memory stays flat however large the extract is
+            events = ET.iterparse(f, events=("start", "end"))
+            _, root = next(events)
+            for event, elem in events:
+                if event != "end":
+                    continue
+                if elem.tag == "node":
+                    node_coordinates[elem.get("id")] = (float(elem.get("lat")), float(elem.get("lon")))
+                elif elem.tag == "way":
+                    tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+                    highway = tags.get("highway")
+                    if highway in HIGHWAY_SPEEDS:
+                        refs = [nd.get("ref") for nd in elem.iter("nd")]
+                        speed = parse_maxspeed(tags.get("maxspeed")) or HIGHWAY_SPEEDS[highway]
+                        oneway = tags.get("oneway")
+                        if oneway in ("yes", "true", "1") or (
+                                oneway is None and (highway in ONEWAY_HIGHWAYS
+                                                    or tags.get("junction") == "roundabout")):
+                            directions = (1,)
+                        elif oneway == "-1":
+                            directions = (-1,)
+                        else:
+                            directions = (1, -1)
+                        edges.append((refs, speed, directions))
+                elif elem.tag != "relation":
+                    continue
+                elem.clear()
+                root.clear()
+        return cls.from_ways(node_coordinates, edges)
+
+    @classmethod
+    def from_ways(cls, node_coordinates, ways):
+        node_ids = {}
+        sources, targets, speeds = [], [], []
+        for refs, speed, directions in ways:
+            refs = [ref for ref in refs if ref in node_coordinates]
+            ids = [node_ids.setdefault(ref, len(node_ids)) for ref in refs]
+            for a, b in zip(ids, ids[1:]):
+                for direction in directions:
+                    sources.append(a if direction == 1 else b)
+                    targets.append(b if direction == 1 else a)
+                    speeds.append(speed)
+
+        coordinates = np.zeros((len(node_ids), 2))
+        for ref, i in node_ids.items():
+            coordinates[i] = node_coordinates[ref]
+        sources = np.asarray(sources, dtype=np.int32)
+        targets = np.asarray(targets, dtype=np.int32)
+        lengths = paired_distances(coordinates[sources], coordinates[targets], "haversine")
+        durations = lengths / np.asarray(speeds) * 3600
+
+        # csr_matrix sums duplicate edges, so keep only the shortest of each pair
+        order = np.lexsort((lengths, targets, sources))
+        sources, targets = sources[order], targets[order]
+        lengths, durations = lengths[order], durations[order]
+        first = np.ones(len(sources), dtype=bool)
+        first[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+        sources, targets = sources[first], targets[first]
+        lengths, durations = lengths[first], durations[first]
+
+        indptr = np.zeros(len(coordinates) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(coordinates)), out=indptr[1:])
+        # Zero-length edges would vanish from the sparse graph
+        return cls(coordinates, indptr, targets, np.maximum(lengths, 1e-9), np.maximum(durations, 1e-9))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(arrays["coordinates"], arrays["indptr"], arrays["indices"],
+                       arrays["lengths"], arrays["durations"])
+
+    def save(self, path):
+        np.savez(path, coordinates=self.coordinates,
+                 indptr=self.distance_graph.indptr, indices=self.distance_graph.indices,
+                 lengths=self.distance_graph.data, durations=self.duration_graph.data)
+
+    # Function to snap locations to their nearest routable road nodes
+    def snap(self, locations):
+        points = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+        _, nearest = self.snap_tree.query(to_unit_sphere(points))
+        nodes = self.snap_nodes[nearest]
+        offsets = paired_distances(points, self.coordinates[nodes], "haversine")
+        return nodes, offsets
+
+    # Function to compute a many-to-many road distance (km) or duration (s) matrix
+    def matrix(self, locations, metric="road_distance", destinations=None):
+        if metric == "road_distance":
+            graph, snap_scale = self.distance_graph, 1.0
+        elif metric == "road_duration":
+            graph, snap_scale = self.duration_graph, 3600 / SNAP_SPEED_KMH
+        else:
+            raise ValueError(f"Unknown road metric: {metric!r} (expected one of {ROAD_METRICS})")
+
+        origins = locations
+        destinations = locations if destinations is None else destinations
+        origin_nodes, origin_offsets = self.snap(origins)
+        target_nodes, target_offsets = self.snap(destinations)
+
+        unique_origins, inverse = np.unique(origin_nodes, return_inverse=True)
+        node_matrix = np.empty((len(unique_origins), len(target_nodes)))
+        # Every origin-target path is at most the detour through the first
+        # origin, so later searches stop at that radius instead of settling
+        # the whole extract
+        hub = unique_origins[0]
+        node_matrix[0] = dijkstra(graph, directed=True, indices=hub)[target_nodes]
+        limit = np.inf
+        if len(unique_origins) > 1:
+            to_hub = dijkstra(graph.T, directed=True, indices=hub)[unique_origins]
+            limit = (to_hub.max() + node_matrix[0].max()) * (1 + 1e-9)
+        batch = max(1, DIJKSTRA_BATCH_CELLS // max(graph.shape[0], 1))
+        for start in range(1, len(unique_origins), batch):
+            paths = dijkstra(graph, directed=True, indices=unique_origins[start:start + batch],
+                             limit=limit)
+            node_matrix[start:start + batch] = paths[:, target_nodes]
+
+        matrix = (node_matrix[inverse]
+                  + snap_scale * origin_offsets[:, None] + snap_scale * target_offsets[None, :])
+        if destinations is origins:
+            np.fill_diagonal(matrix, 0.0)
+        return matrix
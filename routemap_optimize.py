@@ -1,91 +1,374 @@
+import os
 import streamlit as st
 import pandas as pd
 from geopy.distance import geodesic
-import requests
-import math as python_math  # Using python-math
-import random2  # Using random2
 import folium
 from streamlit_folium import st_folium
+from geocode_cache import GeocodeCache
+from geocoding import geocode_addresses
+from annealing import BATCH_SIZE, BATCH_THRESHOLD, anneal, make_schedule, tour_length
+from construction import construct_tour
+from anytime import Budget
+from distance_matrix import (CondensedDistanceMatrix, batch_distance_function, distance_function,
+                             is_symmetric, symmetrized, update_distance_matrix)
+from held_karp import EXACT_THRESHOLD, held_karp
+from lin_kernighan import lin_kernighan
+from local_search import POLISH_TIME_SHARE, candidate_lists, local_search
+from lower_bound import BOUND_THRESHOLD, BOUND_TIME_SHARE, held_karp_bound, optimality_gap
+from matrix_store import MatrixStore
+from parallel_solver import parallel_genetic, parallel_multistart, parallel_tempering
+from road_network import ROAD_METRICS, RoadNetwork
+from seeding import make_rng
+from solution_cache import SolutionCache
+from sparse_graph import DEFAULT_NEIGHBORS, SPARSE_MATRIX_THRESHOLD, SparseDistanceGraph
+from vrp import solve_vrp
+
+# Local OSM road network, loaded once per server process when configured
+# ROUTEMAP_OSM_PATH points at an .osm(.gz/.bz2) extract or a saved .npz graph
+@st.cache_resource
+def get_road_network():
+    path = os.environ.get("ROUTEMAP_OSM_PATH")
+    if not path:
+        return None
+    if path.endswith(".npz"):
+        return RoadNetwork.load(path)
+    return RoadNetwork.from_osm(path)
+
+# Seconds the Optimize Route button waits for all addresses to geocode
+GEOCODE_TIMEOUT = 30
+
+# Shared on-disk geocode cache, opened once per server process
+@st.cache_resource
+def get_geocode_cache():
+    return GeocodeCache()
+
+# Shared on-disk solution cache, opened once per server process
+@st.cache_resource
+def get_solution_cache():
+    return SolutionCache()
+
+# Shared on-disk matrix store, opened once per server process
+@st.cache_resource
+def get_matrix_store():
+    return MatrixStore()
 
 # Function to compute distance matrix
-@st.cache_data
-def compute_distance_matrix(locations):
-    num_locations = len(locations)
-    distance_matrix = [[0] * num_locations for _ in range(num_locations)]
-    for i in range(num_locations):
-        for j in range(i, num_locations):
-            distance = geodesic(locations[i], locations[j]).kilometers
-            distance_matrix[i][j] = distance
-            distance_matrix[j][i] = distance
-    return distance_matrix
+# metric="geodesic" is accurate ellipsoidal distance, "haversine" is faster spherical
+# Matrices are persisted as memory-mapped .npy files keyed by coordinates and metric
+def compute_distance_matrix(locations, metric="geodesic"):
+    return get_matrix_store().get_or_build(locations, metric)
 
 # Function to create a data model for TSP
-def create_data_model(locations):
+# neighbors=k stores only each stop's k nearest distances (a SparseDistanceGraph);
+# very large instances use the sparse form automatically
+# compact=True keeps only the upper triangle as float32 (CondensedDistanceMatrix),
+# which is what we want for matrices held in session state; it does not apply
+# to the directed road metrics
+# metric="road_distance"/"road_duration" asks road_network for drive km/seconds
+# num_vehicles, demands (one per stop) and vehicle_capacity describe the fleet
+# for solve_routes; demands=None counts one unit per stop
+def create_data_model(locations, metric="geodesic", neighbors=None, compact=False,
+                      road_network=None, num_vehicles=1, demands=None, vehicle_capacity=None):
+    if neighbors is None and len(locations) > SPARSE_MATRIX_THRESHOLD:
+        neighbors = DEFAULT_NEIGHBORS
+    if metric in ROAD_METRICS:
+        if road_network is None:
+            raise ValueError(f"metric {metric!r} needs a road_network")
+        # Road matrices are directed (one-way streets), so they stay dense
+        distance_matrix = road_network.matrix(locations, metric)
+    elif neighbors:
+        distance_matrix = SparseDistanceGraph.build(locations, neighbors, metric)
+    elif compact:
+        distance_matrix = CondensedDistanceMatrix.from_dense(compute_distance_matrix(locations, metric))
+    else:
+        distance_matrix = compute_distance_matrix(locations, metric)
+    # Great-circle matrices are symmetric by construction; a road matrix is
+    # checked once here so solves never rescan it
+    symmetric = metric not in ROAD_METRICS or is_symmetric(distance_matrix)
     return {
         'locations': locations,
         'num_locations': len(locations),
-        'distance_matrix': compute_distance_matrix(locations),
+        'metric': metric,
+        'neighbors': neighbors,
+        'compact': compact,
+        'road_network': road_network,
+        'distance_matrix': distance_matrix,
+        'symmetric': symmetric,
+        'num_vehicles': num_vehicles,
+        'demands': demands,
+        'vehicle_capacity': vehicle_capacity,
     }
 
-# Geocode addresses using Photon API
-def geocode_address(address):
-    url = f'https://photon.komoot.io/api/?q={address}'
-    response = requests.get(url)
-    if response.status_code == 200:
-        results = response.json()
-        if results['features']:
-            first_result = results['features'][0]
-            latitude = first_result['geometry']['coordinates'][1]
-            longitude = first_result['geometry']['coordinates'][0]
-            return address, latitude, longitude
-    return None
-
-# TSP Solver using Simulated Annealing with fixed start and end points
-def tsp_solver(data_model, iterations=1000, temperature=10000, cooling_rate=0.95):
-    def distance(point1, point2):
-        return python_math.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
+# Function to update a data model after stops are added, removed or reordered
+# Only distances involving new stops are computed; the fleet carries over, and
+# demands (one per new stop) default to one unit per stop
+def update_data_model(data_model, locations, demands=None):
+    metric = data_model['metric']
+    num_vehicles = data_model.get('num_vehicles', 1)
+    vehicle_capacity = data_model.get('vehicle_capacity')
+    if data_model.get('neighbors') or metric in ROAD_METRICS:
+        return create_data_model(locations, metric, data_model.get('neighbors'),
+                                 data_model.get('compact', False), data_model.get('road_network'),
+                                 num_vehicles, demands, vehicle_capacity)
+    # Start from the stored full-precision matrix when it is still there, so
+    # a compact model's float32 copy never replaces it
+    old_matrix = get_matrix_store().get(data_model['locations'], metric)
+    if old_matrix is None:
+        old_matrix = data_model['distance_matrix']
+    distance_matrix = update_distance_matrix(data_model['locations'], old_matrix, locations, metric)
+    distance_matrix = get_matrix_store().put(locations, metric, distance_matrix)
+    if data_model.get('compact'):
+        distance_matrix = CondensedDistanceMatrix.from_dense(distance_matrix)
+    return {
+        'locations': locations,
+        'num_locations': len(locations),
+        'metric': metric,
+        'neighbors': None,
+        'compact': data_model.get('compact', False),
+        'road_network': None,
+        'distance_matrix': distance_matrix,
+        'symmetric': True,
+        'num_vehicles': num_vehicles,
+        'demands': demands,
+        'vehicle_capacity': vehicle_capacity,
+    }
 
-    num_locations = data_model['num_locations']
+# Function to tell whether a data model's matrix is symmetric, trusting the
+# flag recorded when it was built and scanning only models without one
+def model_is_symmetric(data_model):
+    symmetric = data_model.get('symmetric')
+    return is_symmetric(data_model['distance_matrix']) if symmetric is None else symmetric
+
+# Anytime TSP solve with fixed start and end points
+# method="annealing" runs simulated annealing; polish=True finishes with
+# 2-opt/Or-opt local search to remove crossing edges
+# method="lin_kernighan" runs iterated Lin-Kernighan for the best route quality
+# method="held_karp" solves exactly (up to MAX_EXACT_STOPS stops); "auto" uses it
+# up to EXACT_THRESHOLD stops
+# method="multistart" runs independent annealing restarts on `workers` processes,
+# method="tempering" runs parallel tempering replicas on them, and
+# method="genetic" runs a memetic genetic algorithm (order crossover, 2-opt
+# mutation, local search) with its population bred across them
+# initial picks the starting tour for every method but Held-Karp: "greedy",
+# "nearest_neighbor", "space_filling_curve", "christofides" or "random"
+# schedule="adaptive" calibrates and paces annealing temperatures to the budget;
+# schedule="geometric" uses temperature and cooling_rate per move as before
+# annealing scores candidates in NumPy batches of batch_size on dense and
+# condensed matrices, applying the best of each batch (one iteration per
+# batch); batch_size=0 scores one move at a time, and None (the default)
+# batches BATCH_SIZE moves from BATCH_THRESHOLD stops on, where it measured best
+# time_limit (seconds), patience (iterations without improvement) and target
+# (route distance) stop the search early; iterations is used only when no
+# time_limit is given. gap (e.g. 0.02) stops the search once the route is
+# within that fraction of the Held-Karp lower bound
+# cache (a SolutionCache) returns a cached route for the same stops instantly
+# when it was solved with at least this call's method and budget (or within
+# gap), and warm-starts every method but Held-Karp from a repaired cached
+# route when only a few stops changed or the budget grew; solved routes are added
+# seed (an int or numpy Generator) makes runs with an iteration budget repeat
+# bit for bit; without one every call draws fresh entropy (no shared state)
+# Only Held-Karp handles directed (road) matrices natively; every other method
+# searches the symmetrized matrix and the route is re-costed on the real one
+# Returns the best route found with run statistics, including 'lower_bound'
+# and 'gap' whenever gap is set, and up to BOUND_THRESHOLD stops when the
+# bound fits in the time left. The bound is sized from the best route found;
+# sparse models get no bound and report 'bound_skipped' instead
+def solve_tsp(data_model, iterations=1000, temperature=10000, cooling_rate=0.95, polish=True,
+              method="auto", time_limit=None, patience=None, target=None, workers=None,
+              initial="greedy", schedule="adaptive", gap=None, batch_size=None,
+              cache=None, seed=None):
+    # iterations counts annealing moves (per restart for multistart, over all
+    # replicas for tempering), Lin-Kernighan kicks or generations; the clock
+    # starts here so cache lookups, symmetry checks, construction and
+    # candidate lists all count against time_limit
+    budget = Budget(time_limit, None if time_limit is not None else iterations, patience, target)
+    rng = make_rng(seed)
     locations = data_model['locations']
-    
-    start_point = locations[0]
-    end_point = locations[-1]
-    intermediate_points = locations[1:-1]
-
-    current_solution = list(range(len(intermediate_points)))
-    random2.shuffle(current_solution)
-
-    current_solution = [0] + [i + 1 for i in current_solution] + [num_locations - 1]
-
-    current_distance = sum(
-        distance(locations[current_solution[i - 1]], locations[current_solution[i]])
-        for i in range(1, len(current_solution))
-    )
-
-    best_solution = current_solution[:]
-    best_distance = current_distance
-
-    for _ in range(iterations):
-        temp = temperature * (cooling_rate ** _)
-        new_solution = current_solution[:]
-        i, j = random2.sample(range(1, num_locations - 1), 2)
-        new_solution[i], new_solution[j] = new_solution[j], new_solution[i]
-
-        new_distance = sum(
-            distance(locations[new_solution[i - 1]], locations[new_solution[i]])
-            for i in range(1, len(new_solution))
-        )
-
-        delta = new_distance - current_distance
-        if delta < 0 or random2.random() < python_math.exp(-delta / temp):
-            current_solution = new_solution[:]
-            current_distance = new_distance
-
-        if current_distance < best_distance:
-            best_solution = current_solution[:]
-            best_distance = current_distance
+    metric = data_model['metric']
+    num_locations = data_model['num_locations']
+    distance_matrix = data_model['distance_matrix']
+    # Distances come from the data model's matrix (dense, condensed or sparse)
+    distance = distance_function(distance_matrix)
+    if method == "auto":
+        method = "held_karp" if num_locations <= EXACT_THRESHOLD else "annealing"
+    # A cached route is returned as is only when the run that stored it had at
+    # least the effort asked for now; otherwise it warm-starts the search
+    effort = {'method': method, 'time_limit': time_limit,
+              'iterations': None if time_limit is not None else iterations, 'gap': gap}
+    cached_route = cache.get(locations, metric, effort) if cache is not None else None
+    warm_solution = None
+    # Sparse graphs compute rows on demand, so a bound that reads all n^2
+    # distances per iteration is skipped there ('bound_skipped' says so)
+    sparse = hasattr(distance_matrix, "neighbors")
+    with_bound = (cached_route is None and not sparse
+                  and (gap is not None or num_locations <= BOUND_THRESHOLD))
+    bound = bound_pi = None
+
+    directed = cached_route is None and method != "held_karp" and not model_is_symmetric(data_model)
+    search_matrix = symmetrized(distance_matrix) if directed else distance_matrix
+    search_distance = distance_function(search_matrix) if directed else distance
+    # Annealing and tempering leave POLISH_TIME_SHARE of a time limit to the polish
+    search_time_limit = time_limit
+    if polish and time_limit is not None and method in ("annealing", "tempering"):
+        search_time_limit = time_limit * (1 - POLISH_TIME_SHARE)
+
+    if cached_route is not None:
+        best_solution, best_distance = cached_route, tour_length(cached_route, distance)
+        method = "cache"
+        budget.stop_reason = "cache"
+        result = budget.stats()
+    elif method == "held_karp":
+        best_solution, best_distance = held_karp(distance_matrix)
+        budget.record(improved=True)
+        budget.stop_reason = "optimal"
+        bound = best_distance
+        result = budget.stats()
+    else:
+        details = {}
+        if cache is not None:
+            warm_solution = cache.warm_start(locations, metric, search_distance)
+        current_solution = warm_solution or construct_tour(initial, locations, search_matrix,
+                                                           rng)
+        # Great-circle stops find their candidate neighbours with a KD-tree;
+        # other matrices are scanned in tiles until the time limit
+        neighbour_locations = None if directed or metric in ROAD_METRICS else locations
+        if gap is not None and with_bound:
+            # The gap target needs a bound before the search; it gets a share of
+            # the time limit and is refined from the best route afterwards
+            bound_budget = Budget(None if time_limit is None
+                                  else BOUND_TIME_SHARE * max(0.0, time_limit - budget.elapsed))
+            bound, bound_pi = held_karp_bound(distance_matrix,
+                                              tour_length(current_solution, search_distance),
+                                              budget=bound_budget, symmetric=not directed)
+            gap_target = bound * (1 + gap)
+            budget.target = gap_target if target is None else max(target, gap_target)
+
+        if method == "annealing":
+            budget.time_limit = search_time_limit
+            schedule = make_schedule(schedule, current_solution, search_distance, budget,
+                                     temperature, cooling_rate, rng=rng)
+            if batch_size is None:
+                batch_size = BATCH_SIZE if num_locations >= BATCH_THRESHOLD else 0
+            batch_distance = batch_distance_function(search_matrix) if batch_size else None
+            best_solution, best_distance = anneal(current_solution, search_distance,
+                                                  budget=budget, schedule=schedule,
+                                                  batch_distance=batch_distance,
+                                                  batch_size=batch_size, rng=rng)
+            if polish:
+                budget.time_limit = time_limit
+                candidates = candidate_lists(search_matrix, locations=neighbour_locations,
+                                             budget=budget)
+                best_solution, best_distance = local_search(best_solution, search_matrix,
+                                                            candidates=candidates, budget=budget,
+                                                            symmetric=True)
+        elif method == "lin_kernighan":
+            candidates = candidate_lists(search_matrix, locations=neighbour_locations,
+                                         budget=budget)
+            best_solution, best_distance = lin_kernighan(current_solution, search_matrix,
+                                                         candidates=candidates, budget=budget,
+                                                         rng=rng, symmetric=True)
+        elif method == "genetic":
+            genetic_result = parallel_genetic(search_matrix, current_solution, workers=workers,
+                                              budget=budget, polish=polish, seed=rng,
+                                              symmetric=True)
+            best_solution, best_distance = genetic_result['route'], genetic_result['distance']
+        elif method == "multistart":
+            parallel_result = parallel_multistart(search_matrix, workers=workers,
+                                                  temperature=temperature,
+                                                  cooling_rate=cooling_rate, polish=polish,
+                                                  seed=rng, schedule=schedule, budget=budget,
+                                                  initial_tour=current_solution, symmetric=True)
+            best_solution, best_distance = parallel_result['route'], parallel_result['distance']
+            details = {'restarts': parallel_result['restarts']}
+        elif method == "tempering":
+            budget.time_limit = search_time_limit
+            parallel_result = parallel_tempering(search_matrix, workers=workers, seed=rng,
+                                                 budget=budget, initial_tour=current_solution,
+                                                 symmetric=True)
+            best_solution, best_distance = parallel_result['route'], parallel_result['distance']
+            details = {key: parallel_result[key] for key in ("replicas", "sweeps", "exchanges")}
+            if polish:
+                budget.time_limit = time_limit
+                candidates = candidate_lists(search_matrix, locations=neighbour_locations,
+                                             budget=budget)
+                best_solution, best_distance = local_search(best_solution, search_matrix,
+                                                            candidates=candidates, budget=budget,
+                                                            symmetric=True)
+        else:
+            raise ValueError(f"Unknown solver method: {method!r}")
+        if bound is not None and budget.stop_reason == "target" and best_distance <= gap_target:
+            budget.stop_reason = "gap"
+        result = {**budget.stats(), **details}
+
+    if directed:
+        best_distance = tour_length(best_solution, distance)
+    time_left = None if time_limit is None else time_limit - budget.elapsed
+    if with_bound and method != "held_karp" and (time_left is None or time_left > 0):
+        refined, _ = held_karp_bound(distance_matrix, best_distance, budget=Budget(time_left),
+                                     pi=bound_pi, symmetric=not directed)
+        bound = refined if bound is None else max(bound, refined)
+    if cache is not None and cached_route is None:
+        cache.put(locations, metric, best_solution, best_distance,
+                  {**effort, 'gap': optimality_gap(best_distance, bound)})
+    result = {
+        'route': best_solution,
+        'distance': best_distance,
+        'method': method,
+        **result,
+    }
+    if bound is not None:
+        result['lower_bound'] = bound
+        result['gap'] = optimality_gap(best_distance, bound)
+    elif gap is not None and sparse:
+        result['bound_skipped'] = "sparse distance graph"
+    if cache is not None:
+        result['cache'] = "hit" if cached_route is not None else "warm" if warm_solution else "miss"
+    if method == "annealing" and hasattr(schedule, "telemetry"):
+        result['schedule'] = schedule.telemetry()
+    return result
+
+# TSP Solver with fixed start and end points, returning the route as locations
+def tsp_solver(data_model, iterations=1000, temperature=10000, cooling_rate=0.95, polish=True,
+               method="auto", time_limit=None, patience=None, target=None, workers=None,
+               initial="greedy", schedule="adaptive", gap=None, batch_size=None,
+               cache=None, seed=None):
+    result = solve_tsp(data_model, iterations, temperature, cooling_rate, polish, method,
+                       time_limit, patience, target, workers, initial, schedule, gap, batch_size,
+                       cache, seed)
+    return [data_model['locations'][i] for i in result['route']]
+
+# Capacitated multi-vehicle routing over the data model's fleet: every vehicle
+# drives from the first to the last stop, and together they visit each other
+# stop once without exceeding vehicle_capacity (see vrp.py)
+# time_limit (seconds), iterations (stops examined by the route search) and
+# patience bound the improvement phase. Returns one route per vehicle (an
+# empty list for unused vehicles) with per-vehicle distances and loads
+def solve_routes(data_model, time_limit=None, iterations=None, patience=None):
+    budget = Budget(time_limit, iterations, patience)
+    distance_matrix = data_model['distance_matrix']
+    # Directed (road) matrices are routed on their symmetrized form
+    directed = not model_is_symmetric(data_model)
+    routes, distances = solve_vrp(symmetrized(distance_matrix) if directed else distance_matrix,
+                                  data_model.get('num_vehicles', 1), data_model.get('demands'),
+                                  data_model.get('vehicle_capacity'), budget, symmetric=True)
+    if directed:
+        distance = distance_function(distance_matrix)
+        distances = [tour_length(route, distance) if route else 0.0 for route in routes]
+    demands = data_model.get('demands')
+    return {
+        'routes': routes,
+        'distances': distances,
+        'loads': [sum(demands[i] for i in route[1:-1]) if demands is not None
+                  else max(len(route) - 2, 0) for route in routes],
+        'distance': sum(distances),
+        'method': "clarke_wright",
+        **budget.stats(),
+    }
 
-    return [locations[i] for i in best_solution]
+# Multi-vehicle solver returning each vehicle's route as locations
+def vrp_solver(data_model, time_limit=None, iterations=None, patience=None):
+    result = solve_routes(data_model, time_limit, iterations, patience)
+    return [[data_model['locations'][i] for i in route] for route in result['routes']]
 
 # Display route and distances
 def display_route(route, loc_df):
@@ -138,7 +421,9 @@ def main():
             st.session_state["addresses"] = [""] * 10
 
         if st.button("Optimize Route"):
-            geocoded = [geocode_address(addr) for addr in addresses if addr.strip()]
+            geocoded = geocode_addresses([addr for addr in addresses if addr.strip()],
+                                         cache=get_geocode_cache(),
+                                         total_timeout=GEOCODE_TIMEOUT)
             geocoded = [x for x in geocoded if x is not None]
 
             if len(geocoded) < 2:
@@ -149,9 +434,16 @@ def main():
             place_names = [name for name, _, _ in geocoded]
             loc_df = pd.DataFrame({'Place_Name': place_names, 'Coordinates': locations})
 
-            data_model = create_data_model(locations)
+            if 'data_model' in st.session_state:
+                data_model = update_data_model(st.session_state['data_model'], locations)
+            else:
+                road_network = get_road_network()
+                metric = "road_distance" if road_network is not None else "geodesic"
+                data_model = create_data_model(locations, metric, compact=True,
+                                               road_network=road_network)
+            st.session_state['data_model'] = data_model
             try:
-                optimal_route = tsp_solver(data_model)
+                optimal_route = tsp_solver(data_model, cache=get_solution_cache())
 
                 st.session_state['optimal_route'] = optimal_route
                 st.session_state['loc_df'] = loc_df
@@ -0,0 +1,17 @@
+import numpy as np
+import random2  # Using random2
+
+
+# Function to turn a seed (int, SeedSequence or None) or an existing
+# numpy.random.Generator into a Generator; None draws fresh OS entropy, so
+# unseeded runs differ but never share state with each other
+def make_rng(seed=None):
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.default_rng(seed)
+
+
+# Function to derive a private random2.Random from a Generator, for hot
+# scalar loops where per-call NumPy overhead would dominate
+def scalar_random(rng):
+    return random2.Random(int(rng.integers(2 ** 63)))
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+
+from sqlite_store import SQLiteStore
+
+# Default location of the shared solution cache database
+DEFAULT_CACHE_PATH = os.environ.get("ROUTEMAP_SOLUTION_CACHE", ".solution_cache.sqlite")
+DEFAULT_MAX_ENTRIES = 10_000
+# Coordinates are compared after rounding to this many decimals (~0.1 m)
+COORDINATE_DECIMALS = 6
+# A near hit may differ from the cached stop set by at most this many stops
+# (added plus removed), or NEAR_HIT_FRACTION of the stops on large routes
+NEAR_HIT_STOPS = 5
+NEAR_HIT_FRACTION = 0.1
+# Most recently used entries with the same endpoints checked for a near hit
+NEAR_HIT_CANDIDATES = 50
+# Search effort stored with every entry: solver method, time limit (seconds),
+# iteration budget and the optimality gap the route achieved
+EFFORT_COLUMNS = {'method': "TEXT", 'time_limit': "REAL", 'iterations': "INTEGER", 'gap': "REAL"}
+
+
+# Function to round a (latitude, longitude) pair into a comparable key
+def location_key(location):
+    latitude, longitude = location
+    return (round(float(latitude), COORDINATE_DECIMALS), round(float(longitude), COORDINATE_DECIMALS))
+
+
+def _digest(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part).encode())
+    return digest.hexdigest()
+
+
+# Function to fingerprint an instance: metric, both endpoints and the set of
+# interior stops, so the same stops entered in another order share a key
+def instance_fingerprint(locations, metric):
+    keys = [location_key(location) for location in locations]
+    return _digest(metric, keys[0], keys[-1], sorted(keys[1:-1]))
+
+
+# Function to fingerprint just the metric and endpoints, used to find near hits
+def endpoints_fingerprint(locations, metric):
+    return _digest(metric, location_key(locations[0]), location_key(locations[-1]))
+
+
+# Function to decide whether a stored run's effort covers a requested one, so
+# its route can be returned as is: Held-Karp routes are optimal, a stored gap
+# within the requested gap is good enough, and otherwise the same method must
+# have run for at least as long (or as many iterations, without a time limit)
+def effort_covers(stored, requested):
+    if stored.get('method') == "held_karp":
+        return True
+    if (requested.get('gap') is not None and stored.get('gap') is not None
+            and stored['gap'] <= requested['gap']):
+        return True
+    if stored.get('method') is None or stored['method'] != requested.get('method'):
+        return False
+    if requested.get('time_limit') is not None:
+        return (stored.get('time_limit') is not None
+                and stored['time_limit'] >= requested['time_limit'])
+    return (stored.get('time_limit') is None and stored.get('iterations') is not None
+            and stored['iterations'] >= (requested.get('iterations') or 0))
+
+
+# Function to map a cached route (location keys) onto the indices of
+# `locations`; returns (tour without the missing stops, indices not yet placed)
+def map_route(route, locations):
+    n = len(locations)
+    unplaced = {}
+    for i in range(1, n - 1):
+        unplaced.setdefault(location_key(locations[i]), []).append(i)
+    tour = [0]
+    for key in route[1:-1]:
+        indices = unplaced.get(tuple(key))
+        if indices:
+            tour.append(indices.pop())
+    tour.append(n - 1)
+    missing = sorted(i for indices in unplaced.values() for i in indices)
+    return tour, missing
+
+
+# Function to insert stops into a path tour one at a time, each where it adds
+# the least distance (cheapest insertion)
+def insert_stops(tour, stops, distance):
+    tour = list(tour)
+    for stop in stops:
+        best_position, best_cost = 1, None
+        for k in range(1, len(tour)):
+            a, b = tour[k - 1], tour[k]
+            cost = distance(a, stop) + distance(stop, b) - distance(a, b)
+            if best_cost is None or cost < best_cost:
+                best_position, best_cost = k, cost
+        tour.insert(best_position, stop)
+    return tour
+
+
+# Persistent cache of solved routes in SQLite, shared by every session and
+# process. Routes are stored as coordinates, so an exact hit is any request
+# with the same metric, endpoints and stop set; a near hit (a few stops added
+# or removed) is repaired into a warm-start tour for the solver
+class SolutionCache(SQLiteStore):
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        super().__init__(path, "solutions", max_entries)
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS solutions (
+                    key TEXT PRIMARY KEY,
+                    endpoints TEXT NOT NULL,
+                    route TEXT NOT NULL,
+                    distance REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )""")
+            # Databases from before effort was stored get the columns added empty
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(solutions)")}
+            for column, kind in EFFORT_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE solutions ADD COLUMN {column} {kind}")
+            conn.execute("CREATE INDEX IF NOT EXISTS solutions_endpoints "
+                         "ON solutions (endpoints, accessed)")
+            conn.execute("CREATE INDEX IF NOT EXISTS solutions_accessed ON solutions (accessed)")
+
+    # Function to look up an exact hit; returns a tour over the indices of
+    # `locations` or None. With effort (a dict of EFFORT_COLUMNS) only an entry
+    # whose stored effort covers it is a hit; a weaker entry is left for
+    # warm_start, so a bigger budget improves on it instead of returning it
+    def get(self, locations, metric, effort=None):
+        if len(locations) < 2:
+            return None
+        key = instance_fingerprint(locations, metric)
+        with self._connection() as conn:
+            row = conn.execute(f"SELECT route, {', '.join(EFFORT_COLUMNS)} FROM solutions "
+                               "WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if effort is not None and not effort_covers(dict(zip(EFFORT_COLUMNS, row[1:])),
+                                                        effort):
+                return None
+            conn.execute("UPDATE solutions SET accessed = ? WHERE key = ?", (time.time(), key))
+        tour, missing = map_route(json.loads(row[0]), locations)
+        return tour if not missing else None
+
+    # Function to build a warm-start tour from the closest cached route with the
+    # same metric and endpoints: stops no longer present are dropped and new
+    # ones are added by cheapest insertion. Returns None without a near hit
+    def warm_start(self, locations, metric, distance):
+        if len(locations) < 3:
+            return None
+        wanted = Counter(location_key(location) for location in locations[1:-1])
+        limit = max(NEAR_HIT_STOPS, int(NEAR_HIT_FRACTION * len(locations)))
+        with self._connection() as conn:
+            rows = conn.execute("""
+                SELECT key, route FROM solutions WHERE endpoints = ?
+                ORDER BY accessed DESC LIMIT ?""",
+                (endpoints_fingerprint(locations, metric), NEAR_HIT_CANDIDATES)).fetchall()
+        best = None
+        for key, route in rows:
+            route = json.loads(route)
+            cached = Counter(tuple(stop) for stop in route[1:-1])
+            difference = sum(((wanted - cached) + (cached - wanted)).values())
+            if difference <= limit and (best is None or difference < best[0]):
+                best = (difference, key, route)
+        if best is None:
+            return None
+        with self._connection() as conn:
+            conn.execute("UPDATE solutions SET accessed = ? WHERE key = ?", (time.time(), best[1]))
+        tour, missing = map_route(best[2], locations)
+        return insert_stops(tour, missing, distance)
+
+    # Function to store a solved tour with the effort (a dict of EFFORT_COLUMNS)
+    # that found it; an existing entry is only replaced by a shorter route, and
+    # keeps the larger of the two efforts (the shorter route's when neither
+    # covers the other), since the kept route is as good as either run found
+    def put(self, locations, metric, tour, distance, effort=None):
+        if len(locations) < 2:
+            return
+        key = instance_fingerprint(locations, metric)
+        route = json.dumps([location_key(locations[i]) for i in tour])
+        effort = effort or {}
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(f"SELECT route, distance, {', '.join(EFFORT_COLUMNS)} "
+                               "FROM solutions WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                stored = dict(zip(EFFORT_COLUMNS, row[2:]))
+                shorter = float(distance) < row[1]
+                if not shorter:
+                    route, distance = row[0], row[1]
+                if not (effort_covers(effort, stored)
+                        or shorter and not effort_covers(stored, effort)):
+                    effort = stored
+            conn.execute(f"""
+                INSERT OR REPLACE INTO solutions (key, endpoints, route, distance, accessed,
+                                                  {', '.join(EFFORT_COLUMNS)})
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (key, endpoints_fingerprint(locations, metric), route, float(distance),
+                 time.time(), *(effort.get(column) for column in EFFORT_COLUMNS)))
+            self._evict(conn)
@@ -0,0 +1,101 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+from distance_matrix import paired_distances, pairwise_distances, point_distance
+
+# Above this many locations create_data_model builds a sparse graph instead
+# of a dense matrix (a dense 50k x 50k float64 matrix is about 20 GB)
+SPARSE_MATRIX_THRESHOLD = 20000
+DEFAULT_NEIGHBORS = 16
+
+
+# Function to map (lat, lon) degrees onto unit-sphere xyz coordinates
+# Euclidean order on the sphere matches great-circle order, so a KD-tree over
+# these points answers nearest-neighbour queries on lat/lon correctly
+def to_unit_sphere(points):
+    lat, lon = np.radians(np.asarray(points, dtype=np.float64).reshape(-1, 2)).T
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+# k-nearest-neighbour distance graph in CSR form
+# Each row i stores the distances to its k nearest stops, sorted by neighbour
+# index; any other distance is computed on demand from the coordinates, so
+# memory is O(n * k) instead of O(n^2)
+class SparseDistanceGraph:
+    def __init__(self, points, indptr, indices, data, metric="geodesic"):
+        self.points = points
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.metric = metric
+
+    @classmethod
+    def build(cls, locations, k=DEFAULT_NEIGHBORS, metric="geodesic", dtype=np.float32):
+        points = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+        n = len(points)
+        k = min(k, n - 1)
+        if k <= 0:
+            empty = np.zeros(0, dtype=np.int32)
+            return cls(points, np.zeros(n + 1, dtype=np.int64), empty,
+                       np.zeros(0, dtype=dtype), metric)
+
+        # Ask for one extra neighbour because every point is its own nearest
+        _, neighbors = cKDTree(to_unit_sphere(points)).query(to_unit_sphere(points), k=k + 1)
+        keep = neighbors != np.arange(n)[:, None]
+        # With duplicate coordinates a point may be missing from its own list
+        keep[keep.all(axis=1), -1] = False
+        cols = np.sort(neighbors[keep].reshape(n, k), axis=1).ravel()
+        rows = np.repeat(np.arange(n), k)
+        indptr = np.arange(0, n * k + 1, k, dtype=np.int64)
+        data = paired_distances(points[rows], points[cols], metric).astype(dtype)
+        return cls(points, indptr, cols.astype(np.int32), data, metric)
+
+    @property
+    def shape(self):
+        return (len(self.points), len(self.points))
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes + self.points.nbytes
+
+    # Function to return the neighbour indices and distances of stop i
+    def neighbors(self, i):
+        start, stop = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:stop], self.data[start:stop]
+
+    # Function to return the stored d(i, j) from row i, or None
+    def _stored(self, i, j):
+        start, stop = self.indptr[i], self.indptr[i + 1]
+        pos = start + np.searchsorted(self.indices[start:stop], j)
+        if pos < stop and self.indices[pos] == j:
+            return float(self.data[pos])
+        return None
+
+    # Function to return d(i, j), from the graph if stored in either row,
+    # otherwise computed on demand and rounded to the stored dtype, so that
+    # d(i, j) == d(j, i) whichever way a pair is looked up
+    def distance(self, i, j):
+        if i == j:
+            return 0.0
+        if i > j:
+            i, j = j, i
+        stored = self._stored(i, j)
+        if stored is None:
+            stored = self._stored(j, i)
+        if stored is None:
+            stored = float(self.data.dtype.type(point_distance(self.points[i], self.points[j],
+                                                               self.metric)))
+        return stored
+
+    def __getitem__(self, key):
+        i, j = key
+        return self.distance(i, j)
+
+    # Function to return the full distance row of stop i (computed on demand,
+    # rounded to the stored dtype like distance())
+    def row(self, i):
+        row = pairwise_distances(self.points[i], self.points, self.metric)[0]
+        return row.astype(self.data.dtype).astype(np.float64)
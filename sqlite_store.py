@@ -0,0 +1,38 @@
+import sqlite3
+import threading
+
+
+# Base of the persistent SQLite caches shared by every session and process
+# Each subclass keeps its entries in `table`, keyed by a `key` column and
+# stamped with an `accessed` time; the least recently used entries beyond
+# max_entries are evicted on write
+class SQLiteStore:
+    def __init__(self, path, table, max_entries):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+    # One connection per thread; WAL lets readers run alongside a writer
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Function to evict the least recently used entries beyond max_entries,
+    # inside the caller's transaction on conn
+    def _evict(self, conn):
+        (count,) = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        if count > self.max_entries:
+            conn.execute(f"""
+                DELETE FROM {self.table} WHERE key IN (
+                    SELECT key FROM {self.table} ORDER BY accessed LIMIT ?
+                )""", (count - self.max_entries,))
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute(f"DELETE FROM {self.table}")
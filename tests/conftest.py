@@ -0,0 +1,15 @@
+import os
+import sys
+
+import numpy as np
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Function to draw n random (latitude, longitude) stops, by default in a
+# 2 x 2 degree box around north Georgia
+def random_locations(n, seed=0, latitudes=(33, 35), longitudes=(-85, -83)):
+    rng = np.random.default_rng(seed)
+    return [tuple(point) for point in
+            np.column_stack((rng.uniform(*latitudes, n), rng.uniform(*longitudes, n)))]
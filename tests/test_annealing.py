@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+
+from annealing import (BATCH_DELTA_FUNCTIONS, MOVE_FUNCTIONS, apply_insertion, anneal,
+                       make_schedule, tour_length)
+from anytime import Budget
+from conftest import random_locations
+from construction import construct_tour
+from cooling import REHEAT_CUTOFF, AdaptiveSchedule
+from distance_matrix import batch_distance_function, build_distance_matrix, distance_function
+
+
+@pytest.fixture(scope="module")
+def instance():
+    rng = np.random.default_rng(0)
+    locations = [tuple(point) for point in
+                 np.column_stack((rng.uniform(25, 49, 300), rng.uniform(-124, -67, 300)))]
+    matrix = build_distance_matrix(locations, "haversine")
+    return locations, matrix, distance_function(matrix)
+
+
+def test_adaptive_annealing_improves_a_greedy_tour(instance):
+    locations, matrix, distance = instance
+    greedy = construct_tour("greedy", locations, matrix)
+    budget = Budget(max_iterations=100000)
+    schedule = make_schedule("adaptive", greedy, distance, budget, rng=0)
+    assert schedule.initial_temperature <= 0.1 * tour_length(greedy, distance) / 299
+    tour, length = anneal(greedy, distance, budget=budget, schedule=schedule, rng=0)
+    assert length < 0.95 * tour_length(greedy, distance)
+    assert sorted(tour) == list(range(300))
+
+
+def test_frozen_chain_reheats_early_but_not_late():
+    budget = Budget(max_iterations=1000 * 100)
+    schedule = AdaptiveSchedule(100.0, epoch_length=100, budget=budget)
+    reheated_at = []
+    for _ in range(1000):
+        reheats = schedule.reheats
+        budget.record(count=100)
+        schedule.step(0, 0, count=100)
+        if schedule.reheats > reheats:
+            reheated_at.append(budget.iterations / budget.max_iterations)
+    assert reheated_at
+    assert all(progress < REHEAT_CUTOFF for progress in reheated_at)
+    # Consecutive reheats are at least 5% of the budget apart
+    assert all(b - a >= 0.05 for a, b in zip(reheated_at, reheated_at[1:]))
+
+
+def test_improving_chain_never_reheats():
+    budget = Budget(max_iterations=1000 * 100)
+    schedule = AdaptiveSchedule(100.0, epoch_length=100, budget=budget)
+    for _ in range(1000):
+        budget.record(count=100)
+        schedule.step(0, 1, count=100)
+    assert schedule.reheats == 0
+
+
+def test_batched_best_mode_counts_batches_and_candidate_acceptance(instance):
+    locations, matrix, distance = instance
+    greedy = construct_tour("greedy", locations, matrix)
+    budget = Budget(max_iterations=2000)
+    schedule = make_schedule("adaptive", greedy, distance, budget, rng=0)
+    tour, length = anneal(greedy, distance, budget=budget, schedule=schedule,
+                          batch_distance=batch_distance_function(matrix), batch_size=256, rng=0)
+    assert budget.iterations == 2000
+    # Every epoch saw 256 candidates per batch, so acceptance is not capped at 1/256
+    assert max(epoch['acceptance_rate'] for epoch in schedule.history) > 1 / 256
+    assert length < 0.95 * tour_length(greedy, distance)
+    assert sorted(tour) == list(range(300))
+
+
+def test_unknown_schedule_names_are_refused(instance):
+    locations, matrix, distance = instance
+    with pytest.raises(ValueError, match="linear"):
+        make_schedule("linear", list(range(300)), distance, Budget(max_iterations=10))
+
+
+# Moves whose deltas only read edges in travel order, so they stay exact on
+# directed matrices; 2-opt reverses a segment and needs symmetry
+DIRECTED_MOVES = ("swap", "insertion")
+
+
+@pytest.mark.parametrize("directed", [False, True])
+def test_move_deltas_match_a_full_recompute(directed):
+    rng = np.random.default_rng(1)
+    matrix = build_distance_matrix(random_locations(12, 1), "haversine")
+    if directed:
+        matrix = matrix * rng.uniform(1, 1.5, matrix.shape)
+    distance, batch_distance = distance_function(matrix), batch_distance_function(matrix)
+    moves = DIRECTED_MOVES if directed else tuple(MOVE_FUNCTIONS)
+    for _ in range(200):
+        tour = [0] + list(rng.permutation(np.arange(1, 11))) + [11]
+        length = tour_length(tour, distance)
+        for move in moves:
+            delta_function, apply_function = MOVE_FUNCTIONS[move]
+            i, j = (int(k) for k in rng.choice(np.arange(1, 11), 2, replace=False))
+            if apply_function is not apply_insertion and i > j:
+                i, j = j, i
+            moved = list(tour)
+            apply_function(moved, i, j)
+            expected = tour_length(moved, distance) - length
+            assert delta_function(tour, distance, i, j) == pytest.approx(expected, abs=1e-9)
+            if move in BATCH_DELTA_FUNCTIONS:
+                batch = BATCH_DELTA_FUNCTIONS[move](np.asarray(tour), batch_distance,
+                                                    np.array([i]), np.array([j]))
+                assert batch[0] == pytest.approx(expected, abs=1e-9)
+
+
+def test_solve_tsp_batches_large_routes_by_default(monkeypatch):
+    import annealing
+    from routemap_optimize import solve_tsp
+
+    batch_sizes = []
+    chain = annealing.batched_annealing_chain
+
+    def recording_chain(tour, batch_distance, budget, schedule, moves, batch_size, *args):
+        batch_sizes.append(batch_size)
+        return chain(tour, batch_distance, budget, schedule, moves, batch_size, *args)
+
+    monkeypatch.setattr(annealing, "batched_annealing_chain", recording_chain)
+    large = annealing.BATCH_THRESHOLD
+    cases = [(300, None, []), (large, None, [annealing.BATCH_SIZE]), (large, 0, []),
+             (300, 64, [64])]
+    for n, batch_size, expected in cases:
+        locations = random_locations(n)
+        model = {'locations': locations, 'num_locations': n, 'metric': "haversine",
+                 'distance_matrix': build_distance_matrix(locations, "haversine")}
+        batch_sizes.clear()
+        solve_tsp(model, iterations=50, method="annealing", batch_size=batch_size, polish=False,
+                  seed=0)
+        assert batch_sizes == expected
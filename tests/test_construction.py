@@ -0,0 +1,47 @@
+import pytest
+
+from annealing import tour_length
+from conftest import random_locations
+from construction import CONSTRUCTIONS, construct_tour
+from distance_matrix import build_distance_matrix, distance_function
+
+
+def assert_valid_path(tour, n):
+    assert sorted(tour) == list(range(n))
+    if n > 1:
+        assert tour[0] == 0 and tour[-1] == n - 1
+
+
+@pytest.mark.parametrize("method", CONSTRUCTIONS)
+@pytest.mark.parametrize("n", [1, 2, 3, 4, 5])
+def test_tiny_routes_keep_their_ends(method, n):
+    locations = random_locations(n)
+    tour = construct_tour(method, locations, build_distance_matrix(locations, "haversine"), rng=0)
+    assert_valid_path(tour, n)
+
+
+@pytest.mark.parametrize("method", CONSTRUCTIONS)
+def test_duplicate_stops_are_all_visited(method):
+    # Repeated addresses, including copies of both ends
+    base = random_locations(8)
+    locations = [base[0]] + base[:6] * 2 + [base[6], base[6], base[7]]
+    matrix = build_distance_matrix(locations, "haversine")
+    tour = construct_tour(method, locations, matrix, rng=0)
+    assert_valid_path(tour, len(locations))
+
+
+@pytest.mark.parametrize("method", CONSTRUCTIONS)
+def test_large_routes_keep_their_ends(method):
+    locations = random_locations(300)
+    matrix = build_distance_matrix(locations, "haversine")
+    tour = construct_tour(method, locations, matrix, rng=0)
+    assert_valid_path(tour, 300)
+    if method != "random":
+        distance = distance_function(matrix)
+        random_tour = construct_tour("random", locations, matrix, rng=0)
+        assert tour_length(tour, distance) < tour_length(random_tour, distance) / 3
+
+
+def test_unknown_constructions_are_refused():
+    with pytest.raises(ValueError, match="sweep"):
+        construct_tour("sweep", random_locations(5), None)
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+from geopy.distance import geodesic, great_circle
+
+from conftest import random_locations
+from distance_matrix import (CondensedDistanceMatrix, build_distance_matrix,
+                             build_distance_matrix_blocked, is_symmetric, pairwise_distances,
+                             point_distance, update_distance_matrix)
+
+# Vectorized Vincenty must agree with geopy's geodesic to within a millimetre;
+# haversine uses the IUGG mean radius 6371.0088 km where geopy's great_circle
+# uses 6371.009 km, so it is compared relatively
+GEODESIC_TOLERANCE_KM = 1e-6
+HAVERSINE_RELATIVE_TOLERANCE = 1e-7
+
+
+def world_locations(n, seed=0):
+    return random_locations(n, seed, latitudes=(-80, 80), longitudes=(-180, 180))
+
+
+def test_geodesic_matches_geopy():
+    locations = world_locations(40)
+    matrix = pairwise_distances(locations, locations, "geodesic")
+    for i in range(len(locations)):
+        for j in range(len(locations)):
+            expected = geodesic(tuple(locations[i]), tuple(locations[j])).kilometers
+            assert matrix[i, j] == pytest.approx(expected, abs=GEODESIC_TOLERANCE_KM)
+
+
+def test_haversine_matches_geopy():
+    locations = world_locations(40, seed=1)
+    matrix = pairwise_distances(locations, locations, "haversine")
+    for i in range(len(locations)):
+        for j in range(len(locations)):
+            expected = great_circle(tuple(locations[i]), tuple(locations[j])).kilometers
+            assert matrix[i, j] == pytest.approx(expected, rel=HAVERSINE_RELATIVE_TOLERANCE,
+                                                    abs=1e-9)
+
+
+def test_near_antipodal_pairs_fall_back_to_geopy():
+    locations = [(0.0, 0.0), (0.5, 179.7), (-0.1, 179.99)]
+    matrix = pairwise_distances(locations, locations, "geodesic")
+    for i, a in enumerate(locations):
+        for j, b in enumerate(locations):
+            assert matrix[i, j] == pytest.approx(geodesic(a, b).kilometers,
+                                                 abs=GEODESIC_TOLERANCE_KM)
+
+
+def test_unknown_metric_raises():
+    with pytest.raises(ValueError):
+        pairwise_distances([(0, 0)], [(1, 1)], "manhattan")
+
+
+def test_blocked_build_matches_direct_build():
+    locations = world_locations(120, seed=2)
+    direct = build_distance_matrix(locations, "geodesic")
+    blocked = build_distance_matrix_blocked(locations, "geodesic", workers=2, tile_cells=2000)
+    assert blocked.dtype == np.float32
+    np.testing.assert_allclose(blocked, direct, rtol=1e-6, atol=1e-4)
+    assert np.all(np.diag(blocked) == 0)
+
+
+def test_update_matches_rebuild():
+    locations = world_locations(30, seed=3)
+    matrix = build_distance_matrix(locations, "haversine")
+    new_locations = locations[5:] + world_locations(4, seed=4)
+    updated = update_distance_matrix(locations, matrix, new_locations, "haversine")
+    np.testing.assert_allclose(updated, build_distance_matrix(new_locations, "haversine"),
+                               atol=1e-9)
+
+
+def test_condensed_matrix_lookups():
+    locations = world_locations(25, seed=5)
+    dense = build_distance_matrix(locations, "haversine")
+    condensed = CondensedDistanceMatrix.from_dense(dense)
+    np.testing.assert_allclose(condensed.to_dense(), dense, rtol=1e-6)
+    for i in (0, 7, 24):
+        np.testing.assert_allclose(condensed.row(i), dense[i], rtol=1e-6)
+        for j in (0, 3, 24):
+            assert condensed.distance(i, j) == pytest.approx(dense[i, j], rel=1e-6)
+    rows, cols = np.array([[0, 4], [9, 9]]), np.array([[4, 0], [2, 9]])
+    np.testing.assert_allclose(condensed.distances(rows, cols), dense[rows, cols], rtol=1e-6)
+
+
+def test_scalar_kernels_match_vectorized():
+    locations = world_locations(30, seed=6)
+    for metric in ("haversine", "geodesic"):
+        matrix = pairwise_distances(locations, locations, metric)
+        for i in range(0, 30, 3):
+            for j in range(30):
+                assert point_distance(locations[i], locations[j], metric) == pytest.approx(
+                    matrix[i, j], abs=1e-7)
+    with pytest.raises(ValueError):
+        point_distance((0, 0), (1, 1), "manhattan")
+
+
+def test_condensed_matrix_refuses_directed_input():
+    matrix = build_distance_matrix(world_locations(5, seed=7), "haversine")
+    matrix[1, 3] += 1.0
+    with pytest.raises(ValueError):
+        CondensedDistanceMatrix.from_dense(matrix)
+
+
+def test_symmetry_check_covers_every_tile():
+    matrix = build_distance_matrix(world_locations(50, seed=8), "haversine")
+    assert is_symmetric(matrix, tile_cells=100)
+    matrix[3, 41] += 1.0
+    assert not is_symmetric(matrix, tile_cells=100)
+    assert not is_symmetric(matrix)
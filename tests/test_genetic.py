@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from annealing import tour_length
+from conftest import random_locations
+from construction import random_tour
+from distance_matrix import CondensedDistanceMatrix, build_distance_matrix, distance_function
+from genetic import changed_stops, mutate, order_crossover, tour_lengths
+from parallel_solver import parallel_genetic
+from sparse_graph import SparseDistanceGraph
+
+
+@pytest.fixture(scope="module")
+def matrix():
+    return build_distance_matrix(random_locations(60), "haversine")
+
+
+def test_crossover_and_mutation_keep_a_path_with_fixed_ends():
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        first, second = random_tour(20, rng), random_tour(20, rng)
+        child = order_crossover(first, second, rng)
+        assert sorted(child) == list(range(20))
+        assert child[0] == 0 and child[-1] == 19
+        mutate(child, rng, 3)
+        assert sorted(child) == list(range(20))
+        assert child[0] == 0 and child[-1] == 19
+        # Every stop on an edge neither parent has is listed
+        edges = set(zip(first, first[1:])) | set(zip(second, second[1:]))
+        edges |= {(b, a) for a, b in edges}
+        new = {stop for edge in zip(child, child[1:]) if edge not in edges for stop in edge}
+        assert set(changed_stops(child, first, second)) == new
+
+
+def test_tour_lengths_agree_on_every_matrix_form(matrix):
+    rng = np.random.default_rng(0)
+    tours = [random_tour(60, rng) for _ in range(5)]
+    for form in (matrix, CondensedDistanceMatrix.from_dense(matrix),
+                 SparseDistanceGraph.build(random_locations(60), k=8, metric="haversine")):
+        distance = distance_function(form)
+        np.testing.assert_allclose(tour_lengths(tours, form),
+                                   [tour_length(tour, distance) for tour in tours], rtol=1e-6)
+
+
+def test_memetic_search_improves_a_random_tour(matrix):
+    start = random_tour(60, 0)
+    start_length = tour_length(start, distance_function(matrix))
+    result = parallel_genetic(matrix, start, population_size=8, workers=2, generations=5,
+                              seed=0)
+    assert sorted(result['route']) == list(range(60))
+    assert result['route'][0] == 0 and result['route'][-1] == 59
+    assert result['distance'] == pytest.approx(tour_length(result['route'],
+                                                           distance_function(matrix)))
+    assert result['distance'] < 0.5 * start_length
+    assert result['iterations'] == 5
+    assert result['population'] == 8
+
+
+def test_plain_genetic_search_never_loses_the_best_tour(matrix):
+    start = random_tour(60, 0)
+    result = parallel_genetic(matrix, start, population_size=8, workers=2, generations=3,
+                              polish=False, seed=0)
+    assert result['distance'] <= tour_length(start, distance_function(matrix)) + 1e-9
@@ -0,0 +1,113 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from geocode_cache import GeocodeCache
+from geocoding import geocode_address, geocode_addresses
+from http_client import HttpClient
+
+# Stub Photon server: "missing ..." has no features, "broken ..." always fails
+# with a 500, "flaky ..." fails once before answering and "slow ..." answers
+# after a second; every other query resolves to a point derived from its length
+RESPONSE_DELAY = 0.05
+
+
+class PhotonStub(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)['q'][0]
+        with self.server.lock:
+            self.server.requests.append(query)
+            seen = self.server.requests.count(query)
+        time.sleep(1.0 if query.startswith("slow") else RESPONSE_DELAY)
+        if query.startswith("broken") or (query.startswith("flaky") and seen == 1):
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        features = [] if query.startswith("missing") else [
+            {'geometry': {'coordinates': [-84.0 - len(query) / 100, 34.0]}}]
+        body = json.dumps({'features': features}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def photon():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PhotonStub)
+    server.requests = []
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_port}/api/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client():
+    client = HttpClient(max_retries=2, backoff=0.01, max_backoff=0.02, seed=0)
+    yield client
+    client.close()
+
+
+def test_geocode_address(photon, client):
+    _, url = photon
+    assert geocode_address("1 Main St", client, url) == ("1 Main St", 34.0, -84.09)
+    assert geocode_address("missing street", client, url) is None
+
+
+def test_batch_keeps_order_and_runs_concurrently(photon, client):
+    server, url = photon
+    addresses = [f"{i} Main St" for i in range(16)]
+    started = time.monotonic()
+    results = geocode_addresses(addresses, concurrency=8, client=client, base_url=url)
+    elapsed = time.monotonic() - started
+    assert [result[0] for result in results] == addresses
+    assert len(server.requests) == 16
+    # Sequential requests would take 16 * RESPONSE_DELAY
+    assert elapsed < 16 * RESPONSE_DELAY
+
+
+def test_failures_resolve_to_none_and_retries_recover(photon, client):
+    server, url = photon
+    results = geocode_addresses(["broken road", "flaky lane", "missing way"],
+                                client=client, base_url=url)
+    assert results[0] is None
+    assert results[1] == ("flaky lane", 34.0, -84.1)
+    assert results[2] is None
+    assert server.requests.count("broken road") == 3
+    assert server.requests.count("flaky lane") == 2
+
+
+def test_total_timeout_bounds_the_batch(photon, client):
+    _, url = photon
+    started = time.monotonic()
+    results = geocode_addresses(["slow road", "1 Main St"], client=client, base_url=url,
+                                total_timeout=0.5)
+    assert time.monotonic() - started < 1.0
+    assert results[0] is None
+    assert results[1] is not None
+
+
+def test_cache_skips_repeat_requests(photon, client, tmp_path):
+    server, url = photon
+    cache = GeocodeCache(str(tmp_path / "geocode.sqlite"))
+    addresses = ["1 Main St", "missing street", "broken road"]
+    first = geocode_addresses(addresses, client=client, base_url=url, cache=cache)
+    requests_made = len(server.requests)
+    second = geocode_addresses([" 1 main st ", "Missing Street", "broken road"],
+                               client=client, base_url=url, cache=cache)
+    assert first[0][1:] == second[0][1:]
+    assert second[1] is None
+    # Found and not-found answers are cached; server errors are retried
+    assert server.requests[requests_made:] == ["broken road"] * 3
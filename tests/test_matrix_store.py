@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+
+from conftest import random_locations
+from distance_matrix import CondensedDistanceMatrix, build_distance_matrix
+from matrix_store import MatrixStore, matrix_key
+
+
+def test_get_or_build_round_trip(tmp_path):
+    store = MatrixStore(str(tmp_path))
+    locations = random_locations(20)
+    assert store.get(locations, "haversine") is None
+    matrix = store.get_or_build(locations, "haversine")
+    np.testing.assert_allclose(matrix, build_distance_matrix(locations, "haversine"))
+    assert isinstance(store.get(locations, "haversine"), np.memmap)
+    assert matrix_key(locations, "haversine") != matrix_key(locations, "geodesic")
+
+
+def test_one_dtype_per_key(tmp_path):
+    store = MatrixStore(str(tmp_path))
+    locations = random_locations(20)
+    compact = CondensedDistanceMatrix.from_dense(build_distance_matrix(locations, "haversine"))
+    assert store.put(locations, "haversine", np.asarray(compact)).dtype == np.float64
+    assert store.get_or_build(locations, "haversine").dtype == np.float64
+
+
+def test_least_recently_used_matrices_are_evicted(tmp_path):
+    # Each 20-stop float64 matrix takes 3328 bytes on disk
+    store = MatrixStore(str(tmp_path), max_bytes=3 * 3328)
+    sets = [random_locations(20, seed) for seed in range(4)]
+    for i, locations in enumerate(sets[:3]):
+        store.get_or_build(locations, "haversine")
+        os.utime(store.path_for(locations, "haversine"), (i, i))
+    # Reading the oldest matrix makes the second one least recently used
+    assert store.get(sets[0], "haversine") is not None
+    store.get_or_build(sets[3], "haversine")
+    assert store.get(sets[1], "haversine") is None
+    for locations in (sets[0], sets[2], sets[3]):
+        assert store.get(locations, "haversine") is not None
@@ -0,0 +1,125 @@
+import gzip
+
+import numpy as np
+import pytest
+
+from distance_matrix import paired_distances
+from road_network import RoadNetwork, parse_maxspeed
+
+# A 3 x 3 street grid about 1 km across. Row 0 is a one-way street running
+# east, the footway is not drivable, and node 99 sits on an isolated road
+# that must never be snapped to
+GRID = {f"{r}{c}": (34.0 + 0.01 * r, -84.0 + 0.01 * c) for r in range(3) for c in range(3)}
+OSM = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+{nodes}
+  <node id="98" lat="34.5" lon="-84.5"/>
+  <node id="99" lat="34.5001" lon="-84.5"/>
+  <way id="1"><nd ref="00"/><nd ref="01"/><nd ref="02"/>
+    <tag k="highway" v="residential"/><tag k="oneway" v="yes"/></way>
+  <way id="2"><nd ref="10"/><nd ref="11"/><nd ref="12"/>
+    <tag k="highway" v="primary"/><tag k="maxspeed" v="50 mph"/></way>
+  <way id="3"><nd ref="20"/><nd ref="21"/><nd ref="22"/><tag k="highway" v="residential"/></way>
+  <way id="4"><nd ref="00"/><nd ref="10"/><nd ref="20"/><tag k="highway" v="residential"/></way>
+  <way id="5"><nd ref="02"/><nd ref="12"/><nd ref="22"/><tag k="highway" v="residential"/></way>
+  <way id="6"><nd ref="01"/><nd ref="11"/><tag k="highway" v="footway"/></way>
+  <way id="7"><nd ref="98"/><nd ref="99"/><tag k="highway" v="residential"/></way>
+</osm>
+"""
+
+
+def edge(a, b):
+    return float(paired_distances([GRID[a]], [GRID[b]], "haversine")[0])
+
+
+@pytest.fixture(scope="module")
+def osm_path(tmp_path_factory):
+    nodes = "\n".join(f'  <node id="{ref}" lat="{lat}" lon="{lon}"/>'
+                      for ref, (lat, lon) in GRID.items())
+    path = tmp_path_factory.mktemp("osm") / "grid.osm"
+    path.write_text(OSM.format(nodes=nodes))
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def network(osm_path):
+    return RoadNetwork.from_osm(osm_path)
+
+
+def test_parse_maxspeed():
+    assert parse_maxspeed("50") == 50
+    assert parse_maxspeed("30 mph") == pytest.approx(48.28032)
+    assert parse_maxspeed("none") is None
+    assert parse_maxspeed(None) is None
+
+
+def test_road_distances_follow_the_streets(network):
+    stops = [GRID["00"], GRID["02"], GRID["22"]]
+    matrix = network.matrix(stops, "road_distance")
+    assert np.all(np.diag(matrix) == 0)
+    # East along the one-way street, then back west the long way round
+    assert matrix[0, 1] == pytest.approx(edge("00", "01") + edge("01", "02"))
+    assert matrix[1, 0] == pytest.approx(edge("02", "12") + edge("12", "11") + edge("11", "10")
+                                         + edge("10", "00"))
+    assert matrix[1, 2] == pytest.approx(matrix[2, 1])
+    assert matrix[0, 1] < matrix[1, 0]
+
+
+def test_road_durations_use_speeds(network):
+    stops = [GRID["10"], GRID["12"]]
+    duration = network.matrix(stops, "road_duration")
+    length = edge("10", "11") + edge("11", "12")
+    assert duration[0, 1] == pytest.approx(length / (50 * 1.609344) * 3600)
+    with pytest.raises(ValueError):
+        network.matrix(stops, "geodesic")
+
+
+def test_snapping_skips_isolated_roads(network):
+    nodes, offsets = network.snap([(34.5, -84.5), GRID["11"]])
+    assert np.all(np.isin(nodes, network.snap_nodes))
+    assert offsets[0] > 40
+    assert offsets[1] == pytest.approx(0, abs=1e-9)
+
+
+def test_off_road_stops_add_the_snap_leg(network):
+    near = (GRID["20"][0] + 0.001, GRID["20"][1])
+    matrix = network.matrix([near, GRID["22"]], "road_distance")
+    offset = float(paired_distances([near], [GRID["20"]], "haversine")[0])
+    assert matrix[0, 1] == pytest.approx(offset + edge("20", "21") + edge("21", "22"))
+
+
+def test_compressed_extract_and_npz_round_trip(network, osm_path, tmp_path):
+    compressed = tmp_path / "grid.osm.gz"
+    with open(osm_path, "rb") as f, gzip.open(compressed, "wb") as out:
+        out.write(f.read())
+    stops = list(GRID.values())
+    expected = network.matrix(stops)
+    np.testing.assert_allclose(RoadNetwork.from_osm(str(compressed)).matrix(stops), expected)
+
+    saved = tmp_path / "grid.npz"
+    network.save(str(saved))
+    np.testing.assert_allclose(RoadNetwork.load(str(saved)).matrix(stops), expected)
+
+
+def test_compact_road_data_model_keeps_both_directions(network):
+    from routemap_optimize import create_data_model
+
+    stops = [GRID["00"], GRID["02"], GRID["22"]]
+    data_model = create_data_model(stops, "road_distance", compact=True, road_network=network)
+    np.testing.assert_allclose(data_model['distance_matrix'], network.matrix(stops))
+    assert data_model['distance_matrix'][0, 1] < data_model['distance_matrix'][1, 0]
+    assert not data_model['symmetric']
+
+
+def test_radius_limited_searches_match_full_dijkstra(network):
+    from scipy.sparse.csgraph import dijkstra
+
+    origins, destinations = list(GRID.values()), [GRID["00"], GRID["20"], GRID["12"]]
+    for metric, graph in (("road_distance", network.distance_graph),
+                          ("road_duration", network.duration_graph)):
+        origin_nodes, _ = network.snap(origins)
+        target_nodes, _ = network.snap(destinations)
+        full = dijkstra(graph, directed=True, indices=origin_nodes)[:, target_nodes]
+        # Stops sit on road nodes, so there is no snap leg to add
+        np.testing.assert_allclose(network.matrix(origins, metric, destinations), full,
+                                   atol=1e-9)
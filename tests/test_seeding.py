@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from conftest import random_locations
+from construction import random_tour
+from distance_matrix import build_distance_matrix
+from parallel_solver import parallel_genetic, parallel_multistart, parallel_tempering
+from routemap_optimize import solve_tsp
+from seeding import make_rng, scalar_random
+
+
+@pytest.fixture(scope="module")
+def model():
+    locations = random_locations(80)
+    return {'locations': locations, 'num_locations': 80, 'metric': "haversine",
+            'distance_matrix': build_distance_matrix(locations, "haversine"), 'symmetric': True}
+
+
+def test_generators_pass_through_and_seeds_repeat():
+    rng = np.random.default_rng(3)
+    assert make_rng(rng) is rng
+    assert make_rng(3).integers(10 ** 9) == make_rng(3).integers(10 ** 9)
+    assert scalar_random(make_rng(3)).random() == scalar_random(make_rng(3)).random()
+
+
+@pytest.mark.parametrize("method", ["annealing", "lin_kernighan", "genetic", "multistart",
+                                    "tempering"])
+def test_seeded_solves_repeat_exactly(model, method):
+    runs = [solve_tsp(model, iterations=300, method=method, initial="random", polish=False,
+                      workers=2, seed=seed) for seed in (7, 7, 8)]
+    assert runs[0]['route'] == runs[1]['route']
+    assert runs[0]['distance'] == runs[1]['distance']
+    if method == "annealing":
+        assert runs[0]['route'] != runs[2]['route']
+
+
+def test_seeded_parallel_runs_do_not_depend_on_the_worker_count(model):
+    matrix = model['distance_matrix']
+    start = random_tour(80, 0)
+    genetic = [parallel_genetic(matrix, start, population_size=8, generations=3, workers=workers,
+                                polish=False, seed=5, symmetric=True)['route']
+               for workers in (1, 3)]
+    assert genetic[0] == genetic[1]
+    # Restart and replica counts default to the worker count, so fix them
+    multistart = [parallel_multistart(matrix, restarts=4, workers=workers, iterations=300,
+                                      polish=False, seed=5, initial_tour=start,
+                                      symmetric=True)['route']
+                  for workers in (1, 2, 4)]
+    assert multistart[0] == multistart[1] == multistart[2]
+    tempering = [parallel_tempering(matrix, replicas=3, workers=workers, sweeps=2,
+                                    sweep_iterations=200, seed=5, initial_tour=start,
+                                    symmetric=True)['route']
+                 for workers in (1, 3)]
+    assert tempering[0] == tempering[1]
@@ -0,0 +1,72 @@
+import sqlite3
+
+from conftest import random_locations
+from distance_matrix import build_distance_matrix, distance_function
+from routemap_optimize import solve_tsp
+from solution_cache import SolutionCache
+
+
+def effort(method="annealing", time_limit=None, iterations=None, gap=None):
+    return {'method': method, 'time_limit': time_limit, 'iterations': iterations, 'gap': gap}
+
+
+def test_exact_hit_needs_at_least_the_stored_effort(tmp_path):
+    cache = SolutionCache(str(tmp_path / "cache.sqlite"))
+    locations = random_locations(12)
+    tour = list(range(12))
+    cache.put(locations, "haversine", tour, 100.0, effort(time_limit=2))
+    assert cache.get(locations, "haversine") == tour
+    assert cache.get(locations, "haversine", effort(time_limit=1)) == tour
+    assert cache.get(locations, "haversine", effort(time_limit=5)) is None
+    assert cache.get(locations, "haversine", effort(iterations=1000)) is None
+    assert cache.get(locations, "haversine", effort("lin_kernighan", time_limit=1)) is None
+    # A bigger budget still starts from the cached route
+    distance = distance_function(build_distance_matrix(locations, "haversine"))
+    assert cache.warm_start(locations, "haversine", distance) == tour
+
+
+def test_optimal_and_within_gap_entries_cover_any_request(tmp_path):
+    cache = SolutionCache(str(tmp_path / "cache.sqlite"))
+    exact, close = random_locations(12, 1), random_locations(12, 2)
+    cache.put(exact, "haversine", list(range(12)), 100.0, effort("held_karp"))
+    cache.put(close, "haversine", list(range(12)), 100.0, effort(time_limit=1, gap=0.01))
+    assert cache.get(exact, "haversine", effort(time_limit=60)) is not None
+    assert cache.get(close, "haversine", effort(time_limit=60, gap=0.02)) is not None
+    assert cache.get(close, "haversine", effort(time_limit=60, gap=0.005)) is None
+
+
+def test_put_keeps_the_shorter_route_and_the_larger_effort(tmp_path):
+    cache = SolutionCache(str(tmp_path / "cache.sqlite"))
+    locations = random_locations(12)
+    short, long = list(range(12)), [0] + list(range(10, 0, -1)) + [11]
+    cache.put(locations, "haversine", short, 100.0, effort(time_limit=1))
+    cache.put(locations, "haversine", long, 120.0, effort(time_limit=10))
+    assert cache.get(locations, "haversine", effort(time_limit=10)) == short
+    cache.put(locations, "haversine", long, 90.0, effort(time_limit=2))
+    assert cache.get(locations, "haversine", effort(time_limit=10)) == long
+
+
+def test_entries_without_effort_are_only_warm_starts(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    with sqlite3.connect(path) as conn:
+        conn.execute("""CREATE TABLE solutions (key TEXT PRIMARY KEY, endpoints TEXT NOT NULL,
+                        route TEXT NOT NULL, distance REAL NOT NULL, accessed REAL NOT NULL)""")
+    cache = SolutionCache(path)
+    locations = random_locations(12)
+    cache.put(locations, "haversine", list(range(12)), 100.0)
+    assert cache.get(locations, "haversine") is not None
+    assert cache.get(locations, "haversine", effort(time_limit=1)) is None
+
+
+def test_solve_tsp_reuses_a_route_only_within_its_budget(tmp_path):
+    cache = SolutionCache(str(tmp_path / "cache.sqlite"))
+    locations = random_locations(60)
+    model = {'locations': locations, 'num_locations': 60, 'metric': "haversine",
+             'distance_matrix': build_distance_matrix(locations, "haversine")}
+    first = solve_tsp(model, iterations=2000, method="annealing", cache=cache, seed=0)
+    assert first['cache'] == "miss"
+    assert solve_tsp(model, iterations=2000, method="annealing", cache=cache)['cache'] == "hit"
+    longer = solve_tsp(model, iterations=20000, method="annealing", cache=cache, seed=0)
+    assert longer['cache'] == "warm"
+    assert longer['distance'] <= first['distance'] + 1e-9
+    assert solve_tsp(model, iterations=20000, method="annealing", cache=cache)['cache'] == "hit"
@@ -0,0 +1,223 @@
+import itertools
+import time
+
+import numpy as np
+import pytest
+
+from annealing import tour_length
+from anytime import Budget
+from conftest import random_locations
+from distance_matrix import (CondensedDistanceMatrix, build_distance_matrix, distance_function,
+                             symmetrized)
+from held_karp import MAX_EXACT_STOPS, held_karp
+from lin_kernighan import lin_kernighan
+from local_search import candidate_lists, local_search
+from lower_bound import held_karp_bound
+from routemap_optimize import solve_routes, solve_tsp
+from sparse_graph import SparseDistanceGraph
+from vrp import solve_vrp
+
+
+def data_model(matrix, locations=None, **fleet):
+    locations = locations or random_locations(len(matrix))
+    return {'locations': locations, 'num_locations': len(locations), 'metric': "haversine",
+            'distance_matrix': matrix, **fleet}
+
+
+def directed_matrix(n, seed=0):
+    matrix = build_distance_matrix(random_locations(n, seed), "haversine")
+    # One-way detours: going "down" the index order costs up to 50% more
+    rng = np.random.default_rng(seed)
+    return matrix * (1 + np.tril(rng.uniform(0, 0.5, (n, n)), -1))
+
+
+def test_symmetric_solvers_refuse_directed_matrices():
+    matrix = directed_matrix(12)
+    with pytest.raises(ValueError):
+        lin_kernighan(list(range(12)), matrix)
+    with pytest.raises(ValueError):
+        local_search(list(range(12)), matrix)
+    with pytest.raises(ValueError):
+        solve_vrp(matrix, 2)
+    lin_kernighan(list(range(12)), symmetrized(matrix))
+    local_search(list(range(12)), symmetrized(matrix))
+
+
+@pytest.mark.parametrize("method", ["held_karp", "annealing", "lin_kernighan"])
+def test_directed_routes_are_costed_on_the_directed_matrix(method):
+    matrix = directed_matrix(12)
+    result = solve_tsp(data_model(matrix), method=method, iterations=2000, seed=1)
+    route = result['route']
+    assert sorted(route) == list(range(12)) and route[0] == 0 and route[-1] == 11
+    assert result['distance'] == pytest.approx(tour_length(route, distance_function(matrix)))
+    assert result['distance'] >= held_karp(matrix)[1] - 1e-9
+
+
+def test_directed_fleet_routes_are_costed_on_the_directed_matrix():
+    matrix = directed_matrix(15)
+    result = solve_routes(data_model(matrix, num_vehicles=2, demands=[1] * 15,
+                                     vehicle_capacity=8))
+    distance = distance_function(matrix)
+    for route, length in zip(result['routes'], result['distances']):
+        assert length == pytest.approx(tour_length(route, distance) if route else 0.0)
+
+
+def brute_force(matrix):
+    n = len(matrix)
+    if n <= 2:
+        return float(matrix[0, n - 1]) if n == 2 else 0.0
+    return min(tour_length((0, *order, n - 1), distance_function(matrix))
+               for order in itertools.permutations(range(1, n - 1)))
+
+
+@pytest.mark.parametrize("n", range(2, 9))
+def test_held_karp_matches_brute_force(n):
+    for seed in range(3):
+        for matrix in (build_distance_matrix(random_locations(n, seed), "haversine"),
+                       directed_matrix(n, seed)):
+            route, length = held_karp(matrix)
+            assert sorted(route) == list(range(n)) and route[0] == 0 and route[-1] == n - 1
+            assert length == pytest.approx(tour_length(route, distance_function(matrix)))
+            assert length == pytest.approx(brute_force(matrix))
+
+
+def test_held_karp_keeps_an_open_path_between_distinct_ends():
+    # Start and end sit far apart on either side of a cluster of stops
+    locations = [(33.0, -85.0)] + random_locations(6, seed=1, latitudes=(33.9, 34.1),
+                                                   longitudes=(-84.1, -83.9)) + [(35.0, -83.0)]
+    matrix = build_distance_matrix(locations, "haversine")
+    route, length = held_karp(matrix)
+    assert route[0] == 0 and route[-1] == 7
+    assert length == pytest.approx(brute_force(matrix))
+
+
+def test_held_karp_refuses_routes_above_its_cap():
+    matrix = build_distance_matrix(random_locations(MAX_EXACT_STOPS + 8), "haversine")
+    with pytest.raises(ValueError, match="at most"):
+        solve_tsp(data_model(matrix), method="held_karp")
+
+
+def test_solve_trusts_the_recorded_symmetry(monkeypatch):
+    import distance_matrix
+    import routemap_optimize
+
+    def scan(matrix, tile_cells=None):
+        raise AssertionError("symmetry was rescanned")
+
+    monkeypatch.setattr(distance_matrix, "is_symmetric", scan)
+    monkeypatch.setattr(routemap_optimize, "is_symmetric", scan)
+    matrix = build_distance_matrix(random_locations(40), "haversine")
+    for method in ("annealing", "lin_kernighan", "multistart", "genetic"):
+        result = solve_tsp(data_model(matrix, symmetric=True), method=method, iterations=200,
+                           workers=2, seed=0)
+        assert sorted(result['route']) == list(range(40))
+    solve_routes(data_model(matrix, symmetric=True, num_vehicles=2))
+
+
+def test_candidate_lists_agree_across_builds():
+    locations = random_locations(300, seed=5)
+    matrix = build_distance_matrix(locations, "haversine")
+    scanned = candidate_lists(matrix)
+    assert candidate_lists(matrix, locations=locations) == scanned
+    assert candidate_lists(CondensedDistanceMatrix.from_dense(matrix)) == scanned
+    assert all(len(nearest) == 10 and i not in nearest for i, nearest in enumerate(scanned))
+    expired = Budget(time_limit=0)
+    assert candidate_lists(matrix, budget=expired) == [[] for _ in range(300)]
+
+
+def test_lin_kernighan_respects_the_time_limit():
+    locations = random_locations(3000, seed=2)
+    matrix = build_distance_matrix(locations, "haversine")
+    tour = [0] + list(np.random.default_rng(0).permutation(np.arange(1, 2999))) + [2999]
+    budget = Budget(time_limit=0.5)
+    started = time.perf_counter()
+    route, length = lin_kernighan(tour, matrix, budget=budget, rng=0)
+    # Candidate lists are built on the same clock
+    assert time.perf_counter() - started < 0.75
+    assert budget.stop_reason == "time_limit"
+    assert sorted(route) == list(range(3000))
+    assert length < tour_length(tour, distance_function(matrix))
+
+
+def test_polish_respects_the_time_limit():
+    locations = random_locations(3000, seed=3)
+    model = data_model(build_distance_matrix(locations, "haversine"), locations)
+    started = time.perf_counter()
+    result = solve_tsp(model, method="annealing", time_limit=0.5, initial="random", seed=0)
+    assert time.perf_counter() - started < 1.5
+    assert result['stop_reason'] == "time_limit"
+    assert sorted(result['route']) == list(range(3000))
+
+
+@pytest.fixture(scope="module")
+def model_200():
+    locations = random_locations(200, seed=4)
+    return data_model(build_distance_matrix(locations, "haversine"), locations)
+
+
+def test_tempering_follows_the_iteration_budget(model_200):
+    result = solve_tsp(model_200, method="tempering", iterations=3000, workers=2, seed=0,
+                       polish=False)
+    assert result['iterations'] == 3000
+    assert result['stop_reason'] == "iterations"
+    assert result['replicas'] == 2 and result['sweeps'] == 1
+
+
+def test_parallel_methods_start_from_the_initial_tour(model_200):
+    greedy = solve_tsp(model_200, method="annealing", iterations=1, polish=False, seed=0)
+    for method in ("multistart", "tempering"):
+        result = solve_tsp(model_200, method=method, iterations=200, workers=2, seed=0,
+                           polish=False, schedule="geometric")
+        assert result['distance'] <= greedy['distance'] + 1e-9
+
+
+def test_multistart_stops_at_the_target(model_200):
+    result = solve_tsp(model_200, method="multistart", iterations=10 ** 9, workers=2, seed=0,
+                       target=10 ** 6)
+    assert result['stop_reason'] == "target"
+    result = solve_tsp(model_200, method="multistart", iterations=500, workers=2, seed=0,
+                       patience=100)
+    assert result['stop_reason'] in ("iterations", "patience")
+    assert result['restarts'] == 2
+
+
+def test_bound_is_sized_from_the_best_route(model_200):
+    result = solve_tsp(model_200, method="annealing", initial="random", iterations=20000,
+                       seed=0)
+    reference, _ = held_karp_bound(model_200['distance_matrix'], result['distance'])
+    assert result['lower_bound'] == pytest.approx(reference, rel=1e-9)
+    assert result['gap'] < 0.15
+
+
+def test_bound_stays_inside_the_time_limit():
+    locations = random_locations(1200, seed=5)
+    model = data_model(build_distance_matrix(locations, "haversine"), locations)
+    started = time.perf_counter()
+    result = solve_tsp(model, method="annealing", time_limit=0.5, seed=0)
+    assert time.perf_counter() - started < 1.0
+    assert 'lower_bound' not in result
+    started = time.perf_counter()
+    result = solve_tsp(model, method="annealing", time_limit=1.0, gap=0.5, seed=0)
+    assert time.perf_counter() - started < 1.5
+    assert result['gap'] is not None
+
+
+def test_bound_reads_any_matrix_form_without_dense_copies():
+    matrix = directed_matrix(10)
+    bound, _ = held_karp_bound(matrix)
+    assert bound <= held_karp(matrix)[1] + 1e-9
+    symmetric = symmetrized(matrix)
+    dense_bound, _ = held_karp_bound(symmetric, iterations=20)
+    condensed_bound, _ = held_karp_bound(CondensedDistanceMatrix.from_dense(symmetric,
+                                                                            dtype=np.float64),
+                                         iterations=20)
+    assert condensed_bound == pytest.approx(dense_bound, rel=1e-9)
+
+
+def test_sparse_models_skip_the_bound():
+    locations = random_locations(300, seed=6)
+    model = data_model(SparseDistanceGraph.build(locations, 10, "haversine"), locations)
+    result = solve_tsp(model, method="annealing", iterations=2000, gap=0.05, seed=0)
+    assert result['bound_skipped'] == "sparse distance graph"
+    assert 'lower_bound' not in result
+    assert sorted(result['route']) == list(range(300))
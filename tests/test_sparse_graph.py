@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from distance_matrix import build_distance_matrix
+from sparse_graph import SparseDistanceGraph
+
+
+@pytest.fixture(scope="module")
+def locations():
+    rng = np.random.default_rng(0)
+    return np.column_stack((rng.uniform(33, 35, 300), rng.uniform(-85, -83, 300)))
+
+
+@pytest.mark.parametrize("metric", ["haversine", "geodesic"])
+def test_graph_matches_dense_matrix(locations, metric):
+    graph = SparseDistanceGraph.build(locations, 8, metric)
+    dense = build_distance_matrix(locations, metric)
+    for i in range(0, 300, 7):
+        neighbors, distances = graph.neighbors(i)
+        assert len(neighbors) == 8
+        # The stored neighbours are the 8 nearest stops
+        nearest = np.sort(np.argsort(dense[i])[1:9])
+        np.testing.assert_array_equal(neighbors, nearest)
+        np.testing.assert_allclose(distances, dense[i, neighbors], rtol=1e-6)
+        for j in range(0, 300, 11):
+            assert graph.distance(i, j) == pytest.approx(dense[i, j], rel=1e-6)
+
+
+def test_lookups_are_symmetric(locations):
+    graph = SparseDistanceGraph.build(locations, 4, "geodesic")
+    for i in range(300):
+        np.testing.assert_allclose(graph.row(i)[::13],
+                                   [graph.distance(j, i) for j in range(0, 300, 13)], rtol=1e-6)
+        for j in range(0, 300, 13):
+            assert graph.distance(i, j) == graph.distance(j, i)
+        for j in graph.neighbors(i)[0]:
+            assert graph.distance(i, j) == graph.distance(j, i)
@@ -0,0 +1,39 @@
+import threading
+import time
+
+from conftest import random_locations
+from geocode_cache import GeocodeCache
+from solution_cache import SolutionCache
+
+
+def test_both_caches_evict_the_least_recently_used_entries(tmp_path):
+    geocodes = GeocodeCache(str(tmp_path / "geocodes.sqlite"), max_entries=2)
+    for address in ("1 Main St", "2 Main St"):
+        geocodes.put(address, (34.0, -84.0))
+        time.sleep(0.01)
+    assert geocodes.get("1 Main St")[0]
+    geocodes.put("3 Main St", (34.0, -84.0))
+    assert [geocodes.get(address)[0] for address in ("1 Main St", "2 Main St", "3 Main St")] \
+        == [True, False, True]
+
+    solutions = SolutionCache(str(tmp_path / "solutions.sqlite"), max_entries=2)
+    instances = [random_locations(6, seed) for seed in range(3)]
+    for locations in instances[:2]:
+        solutions.put(locations, "haversine", list(range(6)), 1.0)
+        time.sleep(0.01)
+    assert solutions.get(instances[0], "haversine") is not None
+    solutions.put(instances[2], "haversine", list(range(6)), 1.0)
+    assert [solutions.get(locations, "haversine") is not None for locations in instances] \
+        == [True, False, True]
+
+
+def test_each_thread_gets_its_own_connection(tmp_path):
+    cache = GeocodeCache(str(tmp_path / "geocodes.sqlite"))
+    connections = []
+    thread = threading.Thread(target=lambda: connections.append(cache._connection()))
+    thread.start()
+    thread.join()
+    assert cache._connection() is cache._connection()
+    assert connections[0] is not cache._connection()
+    (mode,) = cache._connection().execute("PRAGMA journal_mode").fetchone()
+    assert mode == "wal"
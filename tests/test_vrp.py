@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from annealing import tour_length
+from anytime import Budget
+from conftest import random_locations
+from distance_matrix import build_distance_matrix, distance_function
+from vrp import solve_vrp
+
+
+@pytest.fixture(scope="module")
+def matrix():
+    return build_distance_matrix(random_locations(60, 4), "haversine")
+
+
+def assert_feasible(routes, n, num_vehicles, demands, capacity):
+    assert len(routes) == num_vehicles
+    used = [route for route in routes if route]
+    for route in used:
+        assert route[0] == 0 and route[-1] == n - 1
+        assert sum(demands[i] for i in route[1:-1]) <= capacity
+    # Every stop between the shared start and end is visited exactly once
+    visited = sorted(stop for route in used for stop in route[1:-1])
+    assert visited == list(range(1, n - 1))
+
+
+@pytest.mark.parametrize("num_vehicles, capacity", [(4, 32), (6, 21), (10, 13)])
+def test_routes_cover_every_stop_within_capacity(matrix, num_vehicles, capacity):
+    demands = [0] + list(np.random.default_rng(1).integers(1, 4, 58)) + [0]
+    routes, distances = solve_vrp(matrix, num_vehicles, demands, capacity,
+                                  Budget(max_iterations=2000))
+    assert_feasible(routes, 60, num_vehicles, demands, capacity)
+    distance = distance_function(matrix)
+    for route, length in zip(routes, distances):
+        assert length == pytest.approx(tour_length(route, distance) if route else 0.0)
+
+
+def test_stops_count_one_unit_without_demands(matrix):
+    routes, _ = solve_vrp(matrix, 3, capacity=20)
+    assert_feasible(routes, 60, 3, [1] * 60, 20)
+
+
+def test_unused_vehicles_get_empty_routes():
+    # Two stops next to the start and end: one vehicle serves both
+    locations = [(34.0, -84.0), (34.001, -84.0), (34.002, -84.0), (34.003, -84.0)]
+    routes, distances = solve_vrp(build_distance_matrix(locations, "haversine"), 3)
+    assert sorted(routes, key=len) == [[], [], [0, 1, 2, 3]]
+    assert sorted(distances)[:2] == [0.0, 0.0]
+
+
+def test_demand_that_cannot_fit_is_refused(matrix):
+    with pytest.raises(ValueError, match="vehicles"):
+        solve_vrp(matrix, 2, capacity=20)
+    demands = [1] * 60
+    demands[7] = 30
+    with pytest.raises(ValueError, match=r"\[7\]"):
+        solve_vrp(matrix, 4, demands, 20)
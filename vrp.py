@@ -0,0 +1,295 @@
+from collections import deque
+
+from anytime import Budget
+from distance_matrix import distance_function, require_symmetric
+from local_search import EPSILON, LocalSearch, candidate_lists
+
+# Nearest neighbours considered per stop by savings and the route search
+VRP_NEIGHBORS = 20
+
+
+# Function to compute the length of one vehicle route given its interior stops
+def route_length(route, distance, start, end):
+    if not route:
+        return 0.0
+    stops = [start] + route + [end]
+    return sum(distance(a, b) for a, b in zip(stops, stops[1:]))
+
+
+# Function to build routes with the Clarke-Wright savings heuristic
+# Every stop starts on its own route start -> i -> end; joining the route that
+# ends at i to the route that starts at j saves d(i, end) + d(start, j) - d(i, j).
+# Savings are taken largest first (only between candidate neighbours) while
+# the joined load fits in capacity
+def clarke_wright(distance, candidates, demands, capacity, start, end):
+    stops = [i for i in range(len(demands)) if i not in (start, end)]
+    routes = {i: [i] for i in stops}
+    loads = {i: demands[i] for i in stops}
+    route_of = {i: i for i in stops}
+
+    savings = []
+    for i in stops:
+        for j in candidates[i]:
+            if j in (start, end):
+                continue
+            savings.append((distance(i, end) + distance(start, j) - distance(i, j), i, j))
+            savings.append((distance(j, end) + distance(start, i) - distance(j, i), j, i))
+    savings.sort(reverse=True)
+
+    for saving, i, j in savings:
+        if saving <= EPSILON:
+            break
+        a, b = route_of[i], route_of[j]
+        if a == b or routes[a][-1] != i or routes[b][0] != j or loads[a] + loads[b] > capacity:
+            continue
+        # Keep the id of the longer route so fewer stops are relabelled
+        keep, drop = (a, b) if len(routes[a]) >= len(routes[b]) else (b, a)
+        for k in routes[drop]:
+            route_of[k] = keep
+        routes[keep] = routes[a] + routes[b]
+        loads[keep] = loads[a] + loads[b]
+        del routes[drop], loads[drop]
+    return list(routes.values())
+
+
+# Function to insert a stop where it adds the least distance over all routes
+# with room for its demand; returns False when no route has room
+def insert_cheapest(stop, routes, loads, distance, demands, capacity, start, end):
+    best = None
+    for r, route in enumerate(routes):
+        if loads[r] + demands[stop] > capacity:
+            continue
+        stops = [start] + route + [end]
+        for k in range(1, len(stops)):
+            a, b = stops[k - 1], stops[k]
+            cost = distance(a, stop) + distance(stop, b) - distance(a, b)
+            if best is None or cost < best[0]:
+                best = (cost, r, k - 1)
+    if best is None:
+        return False
+    _, r, k = best
+    routes[r].insert(k, stop)
+    loads[r] += demands[stop]
+    return True
+
+
+# Function to cut the routes down to at most num_vehicles, each time making
+# the feasible join of two routes that adds the least distance; when no two
+# routes fit together, the lightest route is dissolved into the others
+def reduce_routes(routes, distance, demands, capacity, num_vehicles, start, end):
+    routes = [list(route) for route in routes]
+    loads = [sum(demands[i] for i in route) for route in routes]
+    while len(routes) > num_vehicles:
+        best = None
+        for a, first in enumerate(routes):
+            for b, second in enumerate(routes):
+                if a == b or loads[a] + loads[b] > capacity:
+                    continue
+                cost = (distance(first[-1], second[0]) - distance(first[-1], end)
+                        - distance(start, second[0]))
+                if best is None or cost < best[0]:
+                    best = (cost, a, b)
+        if best is not None:
+            _, a, b = best
+            routes[a] += routes[b]
+            loads[a] += loads[b]
+            del routes[b], loads[b]
+            continue
+
+        lightest = min(range(len(routes)), key=loads.__getitem__)
+        dissolved = sorted(routes[lightest], key=lambda stop: -demands[stop])
+        del routes[lightest], loads[lightest]
+        for stop in dissolved:
+            if not insert_cheapest(stop, routes, loads, distance, demands, capacity, start, end):
+                raise ValueError(f"Demand does not fit in {num_vehicles} vehicles "
+                                 f"of capacity {capacity}")
+    return routes
+
+
+# Inter-route local search over interior stop lists with fixed start and end
+# Moves make a stop adjacent to one of its candidate neighbours: relocate
+# (move it next to the neighbour), exchange (swap it with a stop next to the
+# neighbour in another route) and 2-opt* (swap route tails so the two become
+# adjacent). Loads are checked against capacity; a don't-look-bit queue
+# revisits only stops whose edges changed
+class RouteSearch:
+    def __init__(self, routes, distance, candidates, demands, capacity, start, end):
+        self.routes = [list(route) for route in routes]
+        self.distance = distance
+        self.candidates = candidates
+        self.demands = demands
+        self.capacity = capacity
+        self.start = start
+        self.end = end
+        n = len(demands)
+        self.route_of = [-1] * n
+        self.pos = [0] * n
+        # prefix[u] is the load of u's route up to and including u
+        self.prefix = [0] * n
+        self.loads = [0] * len(self.routes)
+        for r in range(len(self.routes)):
+            self._reindex(r)
+
+    def _reindex(self, r):
+        load = 0
+        for p, u in enumerate(self.routes[r]):
+            load += self.demands[u]
+            self.route_of[u], self.pos[u], self.prefix[u] = r, p, load
+        self.loads[r] = load
+
+    def _prev(self, u):
+        p = self.pos[u]
+        return self.routes[self.route_of[u]][p - 1] if p > 0 else self.start
+
+    def _next(self, u):
+        route, p = self.routes[self.route_of[u]], self.pos[u]
+        return route[p + 1] if p + 1 < len(route) else self.end
+
+    def _routed(self, v):
+        return v != self.start and v != self.end and self.route_of[v] >= 0
+
+    # Function to try moving u between v and one of v's route neighbours
+    def _try_relocate(self, u):
+        d = self.distance
+        pu, nu = self._prev(u), self._next(u)
+        removal = d(pu, u) + d(u, nu) - d(pu, nu)
+        ru = self.route_of[u]
+        for v in self.candidates[u]:
+            if not self._routed(v):
+                continue
+            rv = self.route_of[v]
+            if rv != ru and self.loads[rv] + self.demands[u] > self.capacity:
+                continue
+            for x, y, after in ((v, self._next(v), True), (self._prev(v), v, False)):
+                if u in (x, y):
+                    continue
+                if removal - (d(x, u) + d(u, y) - d(x, y)) > EPSILON:
+                    touched = (pu, u, nu, x, y)
+                    del self.routes[ru][self.pos[u]]
+                    self._reindex(ru)
+                    self.routes[rv].insert(self.pos[v] + after, u)
+                    self._reindex(rv)
+                    return touched
+        return None
+
+    # Function to try swapping u with a stop next to v in another route
+    def _try_exchange(self, u):
+        d = self.distance
+        ru = self.route_of[u]
+        pu, nu = self._prev(u), self._next(u)
+        for v in self.candidates[u]:
+            if not self._routed(v) or self.route_of[v] == ru:
+                continue
+            for w in (self._prev(v), self._next(v)):
+                if not self._routed(w):
+                    continue
+                rw = self.route_of[w]
+                if (self.loads[ru] - self.demands[u] + self.demands[w] > self.capacity
+                        or self.loads[rw] - self.demands[w] + self.demands[u] > self.capacity):
+                    continue
+                pw, nw = self._prev(w), self._next(w)
+                gain = (d(pu, u) + d(u, nu) + d(pw, w) + d(w, nw)
+                        - d(pu, w) - d(w, nu) - d(pw, u) - d(u, nw))
+                if gain > EPSILON:
+                    self.routes[ru][self.pos[u]], self.routes[rw][self.pos[w]] = w, u
+                    self._reindex(ru)
+                    self._reindex(rw)
+                    return (pu, u, nu, pw, w, nw)
+        return None
+
+    # Function to try swapping the tails of u's and v's routes so that u and v
+    # become adjacent: either u -> v or v -> u
+    def _try_two_opt_star(self, u):
+        d = self.distance
+        ru = self.route_of[u]
+        for v in self.candidates[u]:
+            if not self._routed(v) or self.route_of[v] == ru:
+                continue
+            # (a, b) is the order of the new edge; a's route keeps its head
+            for a, b in ((u, v), (v, u)):
+                ra, rb = self.route_of[a], self.route_of[b]
+                na, pb = self._next(a), self._prev(b)
+                head_a, head_b = self.prefix[a], self.prefix[b] - self.demands[b]
+                if (head_a + self.loads[rb] - head_b > self.capacity
+                        or head_b + self.loads[ra] - head_a > self.capacity):
+                    continue
+                gain = d(a, na) + d(pb, b) - d(a, b) - d(pb, na)
+                if gain > EPSILON:
+                    route_a, route_b = self.routes[ra], self.routes[rb]
+                    cut_a, cut_b = self.pos[a] + 1, self.pos[b]
+                    self.routes[ra] = route_a[:cut_a] + route_b[cut_b:]
+                    self.routes[rb] = route_b[:cut_b] + route_a[cut_a:]
+                    self._reindex(ra)
+                    self._reindex(rb)
+                    return (a, na, pb, b)
+        return None
+
+    # Function to improve until no queued stop has an improving move or the
+    # budget runs out; the budget counts stops examined
+    def run(self, budget):
+        tries = (self._try_relocate, self._try_exchange, self._try_two_opt_star)
+        queue = deque(u for route in self.routes for u in route)
+        queued = set(queue)
+        while queue and not budget.exhausted():
+            u = queue.popleft()
+            queued.discard(u)
+            improved = False
+            for try_move in tries:
+                touched = try_move(u)
+                if touched is not None:
+                    improved = True
+                    for node in touched:
+                        if self._routed(node) and node not in queued:
+                            queue.append(node)
+                            queued.add(node)
+                    break
+            budget.record(improved)
+        return self.routes
+
+
+# Function to polish one route with 2-opt/Or-opt, using only candidates on it
+def polish_route(route, distance, candidates, start, end):
+    if len(route) < 3:
+        return route
+    on_route = set(route) | {start, end}
+    route_candidates = {u: [c for c in candidates[u] if c in on_route] for u in on_route}
+    tour = LocalSearch([start] + route + [end], distance, route_candidates).run()
+    return tour[1:-1]
+
+
+# Function to solve the capacitated vehicle routing problem: up to
+# num_vehicles routes from the first to the last stop that together visit
+# every other stop once, each carrying at most capacity of demand
+# demands=None counts one unit per stop; capacity=None means unlimited
+# Clarke-Wright savings build the routes, the inter-route search improves
+# them within budget (an anytime.Budget; unlimited when None) and each route
+# gets a final 2-opt/Or-opt pass. Returns (routes, distances) with one full
+# path per vehicle; unused vehicles get an empty route
+# Savings, 2-opt* and the route polish assume d(i, j) == d(j, i), so directed
+# matrices are refused; symmetric=True skips the check
+def solve_vrp(distance_matrix, num_vehicles, demands=None, capacity=None, budget=None,
+              neighbors=VRP_NEIGHBORS, symmetric=None):
+    require_symmetric(distance_matrix, "solve_vrp", symmetric)
+    n = len(distance_matrix)
+    start, end = 0, n - 1
+    distance = distance_function(distance_matrix)
+    if demands is None:
+        demands = [0 if i in (start, end) else 1 for i in range(n)]
+    demands = [0 if i in (start, end) else demands[i] for i in range(n)]
+    capacity = float("inf") if capacity is None else capacity
+    too_large = [i for i in range(n) if demands[i] > capacity]
+    if too_large:
+        raise ValueError(f"Stops {too_large} have more demand than vehicle capacity {capacity}")
+    budget = budget or Budget()
+
+    candidates = candidate_lists(distance_matrix, neighbors)
+    routes = clarke_wright(distance, candidates, demands, capacity, start, end)
+    routes = reduce_routes(routes, distance, demands, capacity, num_vehicles, start, end)
+    routes = RouteSearch(routes, distance, candidates, demands, capacity, start, end).run(budget)
+    if budget.stop_reason is None:
+        budget.stop_reason = "local_optimum"
+    routes = [polish_route(route, distance, candidates, start, end) for route in routes if route]
+
+    routes += [[] for _ in range(num_vehicles - len(routes))]
+    distances = [route_length(route, distance, start, end) for route in routes]
+    return [[start] + route + [end] if route else [] for route in routes], distances